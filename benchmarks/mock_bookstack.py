@@ -0,0 +1,221 @@
+"""
+Local stand-in for the BookStack API, serving a synthetic library so the reporter can be run and benchmarked offline.
+
+It implements the endpoints used by the reporter: users, shelves, shelves/{id}, books, chapters, pages, pages/{id} and
+attachments. The list endpoints support count/offset paging, return their total and accept the updated_at filters.
+Every response can be delayed by a fixed latency, and the requests received are counted for the benchmarks.
+
+Run it on its own with, e.g.:
+    python benchmarks/mock_bookstack.py --pages 10000 --latency 0.02
+then point the reporter's BASE_URL at http://127.0.0.1:8765/api.
+"""
+
+# Import libraries
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Define constants
+DEFAULT_PORT = 8765
+MAX_ROWS_PER_FETCH = 500 # Largest count the BookStack API accepts
+API_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+FILTER_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+LIST_ENDPOINTS = ['users', 'shelves', 'books', 'chapters', 'pages', 'attachments']
+
+# Names given to some books and pages, differing only in case, accents or word order, so the duplicate reports have work to do
+DUPLICATE_NAMES = ['Onboarding Guide', 'onboarding guide ', 'Guide Onboarding', 'Benefits', 'Travel Policy', 'Café Rules', 'Cafe rules']
+
+def generate_library(pages, seed=1):
+    """
+    Builds a synthetic library around a number of pages, the other collections being scaled from it:
+    a book per 10 pages, a chapter per 4 pages, a shelf per 5 books, a user per 100 pages (at least 20)
+    and an attachment per 2 pages. The same seed always gives the same library.
+
+    Returns a dictionary holding the records of each list endpoint, the ids of the books on each shelf ('shelf_books')
+    and the tags of each page ('page_tags').
+    """
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+
+    def timestamp(i):
+        return (start + timedelta(minutes=7 * i, microseconds=i)).strftime(API_TIMESTAMP_FORMAT)
+
+    user_count = max(pages // 100, 20)
+    book_count = max(pages // 10, 1)
+    shelf_count = max(book_count // 5, 1)
+    chapter_count = max(pages // 4, 1)
+
+    def user_id():
+        # A few records point to users that no longer exist
+        return rng.randint(1, user_count + 5)
+
+    users = [{'id': i, 'name': f'User {i}', 'slug': f'user-{i}', 'email': f'user{i}@example.com', 'created_at': timestamp(i),
+              'updated_at': timestamp(i + 1), 'external_auth_id': '', 'last_activity_at': None if i % 5 == 0 else timestamp(i + 2),
+              'profile_url': f'https://library.example.com/user/user-{i}', 'edit_url': f'https://library.example.com/settings/users/{i}',
+              'avatar_url': f'https://library.example.com/uploads/images/user/{i}.png'}
+             for i in range(1, user_count + 1)]
+
+    books = [{'id': i, 'name': DUPLICATE_NAMES[i % len(DUPLICATE_NAMES)] if i % 25 == 0 else f'Book {i}', 'slug': f'book-{i}',
+              'description': '' if i % 4 == 0 else f'Description of book {i}', 'created_at': timestamp(i), 'updated_at': timestamp(i + 3),
+              'created_by': user_id(), 'updated_by': user_id(), 'owned_by': user_id()}
+             for i in range(1, book_count + 1)]
+
+    shelves = [{'id': i, 'name': f'Shelf {i}', 'slug': f'shelf-{i}', 'description': '' if i % 2 else f'Description of shelf {i}',
+                'created_at': timestamp(i), 'updated_at': timestamp(i + 1), 'created_by': user_id(), 'updated_by': user_id(), 'owned_by': user_id()}
+               for i in range(1, shelf_count + 1)]
+    # Most books are on one or two shelves, the others are unshelved
+    shelf_books = {shelf['id']: [] for shelf in shelves}
+    for book in books:
+        for shelf_id in rng.sample(range(1, shelf_count + 1), min(rng.choice([0, 1, 1, 1, 2]), shelf_count)):
+            shelf_books[shelf_id].append(book['id'])
+
+    chapters = []
+    book_chapters = {}
+    for i in range(1, chapter_count + 1):
+        book = books[rng.randrange(book_count)]
+        book_chapters.setdefault(book['id'], []).append(i)
+        chapters.append({'id': i, 'book_id': book['id'], 'name': f'Chapter {i}', 'slug': f'chapter-{i}', 'description': '' if i % 3 else f'Description of chapter {i}',
+                         'priority': i, 'created_at': timestamp(i), 'updated_at': timestamp(i + 1), 'created_by': user_id(), 'updated_by': user_id(),
+                         'owned_by': user_id(), 'book_slug': book['slug']})
+
+    page_records = []
+    page_tags = {}
+    for i in range(1, pages + 1):
+        book = books[rng.randrange(book_count)]
+        chapter_ids = book_chapters.get(book['id'])
+        page_records.append({'id': i, 'book_id': book['id'], 'chapter_id': rng.choice(chapter_ids) if chapter_ids and rng.random() < 0.7 else 0,
+                             'name': DUPLICATE_NAMES[i % len(DUPLICATE_NAMES)] if i % 50 == 0 else f'Page {i}', 'slug': f'page-{i}', 'priority': i,
+                             'draft': False, 'template': False, 'created_at': timestamp(i), 'updated_at': timestamp(i + 5), 'created_by': user_id(),
+                             'updated_by': user_id(), 'owned_by': user_id(), 'revision_count': rng.randint(1, 9), 'editor': 'wysiwyg',
+                             'book_slug': book['slug']})
+        page_tags[i] = [{'name': f'tag-{j}', 'value': f'value {j}' if j % 2 else '', 'order': j} for j in range(rng.randint(0, 3))]
+
+    attachments = [{'id': i, 'name': f'Attachment {i}', 'extension': rng.choice(['pdf', 'docx', 'png', '']), 'uploaded_to': rng.randint(1, pages + 10),
+                    'external': i % 3 == 0, 'order': 1, 'created_at': timestamp(i), 'updated_at': timestamp(i + 1), 'created_by': user_id(),
+                    'updated_by': user_id()}
+                   for i in range(1, max(pages // 2, 1) + 1)]
+
+    return {'users': users, 'shelves': shelves, 'books': books, 'chapters': chapters, 'pages': page_records, 'attachments': attachments,
+            'shelf_books': shelf_books, 'page_tags': page_tags}
+
+class MockBookStackServer(ThreadingHTTPServer):
+    """
+    HTTP server answering like the BookStack API from a library made by generate_library, each request being delayed by `latency` seconds.
+
+    The requests received are counted per endpoint, '/_stats' returns the counts and '/_stats?reset=1' also resets them.
+    """
+    daemon_threads = True
+
+    def __init__(self, library, latency=0.0, port=DEFAULT_PORT, host='127.0.0.1'):
+        super().__init__((host, port), MockBookStackHandler)
+        self.library = library
+        self.latency = latency
+        self.pages = {page['id']: page for page in library['pages']}
+        self.shelves = {shelf['id']: shelf for shelf in library['shelves']}
+        self.books = {book['id']: book for book in library['books']}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api'
+
+    def count(self, endpoint):
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def stats(self, reset=False):
+        # Returns the number of requests received in total and per endpoint (e.g. "pages/{id}"), resetting them if asked to.
+        with self.lock:
+            counts = dict(self.counts)
+            if reset:
+                self.counts.clear()
+        return {'requests': sum(counts.values()), 'endpoints': counts}
+
+class MockBookStackHandler(BaseHTTPRequestHandler):
+    # Keep-alive connections, as the reporter's sessions reuse them
+    protocol_version = 'HTTP/1.1'
+    # Buffered writes, so the headers and body of a response leave in one send. Written apart on a keep-alive connection,
+    # they make Nagle's algorithm wait for the client's delayed ACK, about 40ms per request.
+    wbufsize = -1
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        segments = url.path.strip('/').split('/')
+
+        if segments == ['_stats']:
+            return self.send_json(self.server.stats(reset=query.get('reset') == '1'))
+        if len(segments) < 2 or segments[0] != 'api':
+            return self.send_error_json(404, 'Not found')
+
+        endpoint = segments[1] if len(segments) == 2 else f'{segments[1]}/{{id}}'
+        self.server.count(endpoint)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if len(segments) == 2 and segments[1] in LIST_ENDPOINTS:
+            return self.send_json(self.list_records(self.server.library[segments[1]], query))
+        if len(segments) == 3 and segments[1] in ('shelves', 'pages') and segments[2].isdigit():
+            record = self.detail_record(segments[1], int(segments[2]))
+            if record is not None:
+                return self.send_json(record)
+        return self.send_error_json(404, 'Not found')
+
+    def list_records(self, records, query):
+        # Applies the updated_at filters, then the count/offset paging of the BookStack list endpoints.
+        for name, keep in [('filter[updated_at:gte]', lambda value, bound: value >= bound), ('filter[updated_at:gt]', lambda value, bound: value > bound)]:
+            if name in query:
+                bound = datetime.strptime(query[name], FILTER_TIMESTAMP_FORMAT)
+                records = [record for record in records if keep(datetime.strptime(record['updated_at'], API_TIMESTAMP_FORMAT).replace(microsecond=0), bound)]
+        count = min(int(query.get('count', 100)), MAX_ROWS_PER_FETCH)
+        offset = int(query.get('offset', 0))
+        return {'data': records[offset:offset + count], 'total': len(records)}
+
+    def detail_record(self, collection, record_id):
+        # Returns a shelf with its books or a page with its tags, or None for an unknown id.
+        if collection == 'shelves' and record_id in self.server.shelves:
+            books = [self.server.books[book_id] for book_id in self.server.library['shelf_books'][record_id]]
+            return {**self.server.shelves[record_id], 'books': [{'id': book['id'], 'name': book['name'], 'slug': book['slug']} for book in books]}
+        if collection == 'pages' and record_id in self.server.pages:
+            return {**self.server.pages[record_id], 'html': '', 'tags': self.server.library['page_tags'][record_id]}
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def send_error_json(self, status, message):
+        self.send_json({'error': {'code': status, 'message': message}}, status)
+
+    def log_message(self, format, *args):
+        # Requests are counted rather than logged
+        pass
+
+def start_server(pages, latency=0.0, port=DEFAULT_PORT, seed=1):
+    # Generates a library and serves it from a background thread, returns the running MockBookStackServer.
+    server = MockBookStackServer(generate_library(pages, seed), latency, port)
+    threading.Thread(target=server.serve_forever, name='mock-bookstack', daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serves a synthetic library through a local stand-in for the BookStack API.")
+    parser.add_argument('--pages', type=int, default=1000, help="Number of pages of the library, the other collections are scaled from it (default: 1000)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each response is delayed by (default: 0)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the generated library (default: 1)")
+    args = parser.parse_args()
+
+    server = MockBookStackServer(generate_library(args.pages, args.seed), args.latency, args.port)
+    print(f"Serving a library of {args.pages} pages at {server.url}")
+    server.serve_forever()
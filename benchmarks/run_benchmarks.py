@@ -0,0 +1,164 @@
+"""
+End-to-end benchmark of the reporter against the local stand-in for the BookStack API (see mock_bookstack.py), run offline.
+
+For each library size a fresh process, starting from empty caches, runs run_setup then run_reports for every report
+and records for each stage its wall time, the number of API requests it sent and the peak resident memory of the process.
+The results can be saved and compared with those of another build, including the builds from before RunContext whose
+run_setup and run_reports take no arguments:
+
+    python benchmarks/run_benchmarks.py                                    # 1k, 10k and 100k pages
+    python benchmarks/run_benchmarks.py --pages 1000 10000 --latency 0.02 --output before.json
+    python benchmarks/run_benchmarks.py --pages 1000 10000 --latency 0.02 --baseline before.json
+"""
+
+# Import libraries
+import argparse
+import glob
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from mock_bookstack import start_server
+
+# Define constants
+DEFAULT_PAGES = [1000, 10000, 100000]
+REPORTER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask-library-reporter.py')
+MEMORY_SAMPLE_INTERVAL = 0.02 # Seconds between two samples of the resident memory
+
+# Settings of the reporter overridden during the benchmarks, so the results don't depend on the time of day or on a schedule
+BENCHMARK_ENV = {'TOKEN_ID': 'benchmark', 'TOKEN_SECRET': 'benchmark', 'APP_SECRET_KEY': 'benchmark', 'USER_NAME': 'benchmark', 'PASSWORD': 'benchmark',
+                 'LOW_IMPACT_HOURS': '', 'MAX_REQUESTS_PER_SECOND': '0', 'REPORT_SCHEDULE': ''}
+
+class PeakMemory:
+    """
+    Samples the resident memory of the process every MEMORY_SAMPLE_INTERVAL seconds, keeping the highest value since the last reset.
+
+    Reads /proc/self/statm, where it is not available the peak of the whole process (ru_maxrss) is used instead.
+    """
+
+    def __init__(self):
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.peak = 0
+        self.reset()
+        threading.Thread(target=self.sample, name='peak-memory', daemon=True).start()
+
+    def current(self):
+        try:
+            with open('/proc/self/statm') as file:
+                return int(file.read().split()[1]) * self.page_size
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def sample(self):
+        while True:
+            self.peak = max(self.peak, self.current())
+            time.sleep(MEMORY_SAMPLE_INTERVAL)
+
+    def reset(self):
+        # Starts a new stage, returns the peak of the previous one in MB.
+        peak, self.peak = max(self.peak, self.current()), self.current()
+        return round(peak / 1024 / 1024, 1)
+
+def request_stats(api_url):
+    # Returns the requests received by the mock server since the last call, resetting its counts.
+    with urllib.request.urlopen(f"{api_url.removesuffix('/api')}/_stats?reset=1") as response:
+        return json.load(response)
+
+def run_worker(reporter_path, api_url):
+    """
+    Runs the setup and the reports once against the mock server, from the current directory, and returns the results of each stage.
+    Runs in its own process, started by benchmark, so every library size starts from a fresh process and empty caches.
+    """
+    memory = PeakMemory()
+    os.makedirs('./reports', exist_ok=True)
+
+    # The reporter is imported from its own folder, so the modules next to it can be imported too
+    sys.path.insert(0, os.path.dirname(reporter_path))
+    reporter = importlib.import_module(os.path.basename(reporter_path).removesuffix('.py'))
+    reporter.BASE_URL = api_url
+    request_stats(api_url)
+    memory.reset()
+
+    # Builds from before RunContext keep the state of the run in globals, their setup and reports take no arguments
+    # and return None
+    args = (reporter.RunContext(),) if hasattr(reporter, 'RunContext') else ()
+
+    stages = {}
+    start = time.perf_counter()
+    if reporter.run_setup(*args) is False:
+        raise RuntimeError("The setup could not gather the library data")
+    stages['setup'] = {'seconds': round(time.perf_counter() - start, 2), **request_stats(api_url), 'peak_mb': memory.reset()}
+
+    start = time.perf_counter()
+    if reporter.run_reports(*args) is False:
+        raise RuntimeError("The reports could not gather the library data")
+    stages['reports'] = {'seconds': round(time.perf_counter() - start, 2), **request_stats(api_url), 'peak_mb': memory.reset()}
+    # Every build names its report files library-report*, the directory starts empty
+    stages['reports']['file_mb'] = round(sum(os.path.getsize(path) for path in glob.glob('./reports/library-report*')) / 1024 / 1024, 1)
+    return stages
+
+def benchmark(pages, latency, reporter_path, python=sys.executable):
+    # Serves a library of `pages` pages and runs a worker process against it with the `python` interpreter,
+    # returns the results of each stage.
+    server = start_server(pages, latency, port=0)
+    try:
+        with tempfile.TemporaryDirectory(prefix='reporter-benchmark-') as directory:
+            env = {**os.environ, **BENCHMARK_ENV, 'CACHE_PATH': os.path.join(directory, 'reports', 'reporter-cache.sqlite3')}
+            worker = subprocess.run([python, os.path.abspath(__file__), '--worker', '--api-url', server.url, '--reporter', reporter_path],
+                                    cwd=directory, env=env, capture_output=True, text=True)
+            if worker.returncode != 0:
+                raise RuntimeError(f"The benchmark of {pages} pages failed:\n{worker.stderr}")
+            # The results are on the last line, anything the reporter printed comes before them
+            return json.loads(worker.stdout.strip().splitlines()[-1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def print_results(results, baseline=None):
+    # Prints a table of the results, with the change of the wall time against the baseline when one is given.
+    print(f"{'pages':>8} {'stage':<8} {'seconds':>9} {'requests':>9} {'peak MB':>8}" + (f" {'vs baseline':>12}" if baseline else ''))
+    for pages, stages in results.items():
+        for stage, result in stages.items():
+            line = f"{pages:>8} {stage:<8} {result['seconds']:>9.2f} {result['requests']:>9} {result['peak_mb']:>8.1f}"
+            before = (baseline or {}).get(pages, {}).get(stage)
+            if before and before['seconds']:
+                line += f" {result['seconds'] / before['seconds']:>11.2f}x"
+            print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the reporter end to end against a local stand-in for the BookStack API.")
+    parser.add_argument('--pages', type=int, nargs='+', default=DEFAULT_PAGES, help="Library sizes to benchmark, in pages (default: 1000 10000 100000)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each API response is delayed by (default: 0)")
+    parser.add_argument('--reporter', default=REPORTER_PATH, help="Path of the reporter to benchmark, e.g. a checkout of another build")
+    parser.add_argument('--python', default=sys.executable, help="Python interpreter running the reporter, for builds needing another version (default: this one)")
+    parser.add_argument('--output', help="JSON file the results are saved to")
+    parser.add_argument('--baseline', help="JSON file of earlier results to compare with")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--api-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(os.path.abspath(args.reporter), args.api_url)))
+        sys.exit()
+
+    results = {}
+    for pages in args.pages:
+        print(f"Benchmarking {pages} pages...", file=sys.stderr)
+        results[str(pages)] = benchmark(pages, args.latency, os.path.abspath(args.reporter), args.python)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'latency': args.latency, 'results': results}, file, indent=2)
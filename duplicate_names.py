@@ -0,0 +1,118 @@
+"""
+Matching of duplicate names for the duplicate reports of the library reporter.
+
+Kept apart from flask-library-reporter.py, which starts threads, sessions and caches when imported, so the processes
+matching duplicates only import this module.
+"""
+
+# Import libraries
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+import pandas as pd
+
+# Define constants
+# Only names sharing their numbers and first DUPLICATE_BLOCK_PREFIX letters are compared, each with the DUPLICATE_WINDOW names around it in order.
+DUPLICATE_BLOCK_PREFIX = 4
+DUPLICATE_WINDOW = 20
+
+def normalize_name(name):
+    # Returns the form of a name used to find duplicates: casefolded, without accents or punctuation and with single spaces.
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    name = re.sub(r'[\W_]+', ' ', name.casefold())
+    return ' '.join(name.split())
+
+def sort_words(key):
+    return ' '.join(sorted(key.split()))
+
+def duplicate_blocks(key, sorted_key):
+    # Returns the blocks a normalized name is compared in, each with the key the block is ordered by: names with the same
+    # numbers, starting with the same letters either as written or with their words sorted, so "Guide Onboarding" still
+    # meets "Onboarding Guide" right next to it.
+    numbers = ' '.join(re.findall(r'\d+', key))
+    return [((numbers, 'words', key[:DUPLICATE_BLOCK_PREFIX]), key), ((numbers, 'sorted', sorted_key[:DUPLICATE_BLOCK_PREFIX]), sorted_key)]
+
+def changed_words_match(key, other, threshold):
+    # Returns whether the words two names don't share are spelled alike, so names where a word was replaced by another,
+    # like "Team A Handbook" and "Team B Handbook", are not duplicates. Words only added to one of the names are allowed.
+    words, other_words = Counter(key.split()), Counter(other.split())
+    changed, other_changed = ''.join((words - other_words).elements()), ''.join((other_words - words).elements())
+    return not changed or not other_changed or SequenceMatcher(None, changed, other_changed).ratio() >= threshold
+
+def find_duplicates(names, threshold):
+    """
+    Finds the names of a report that are duplicates of each other.
+
+    Names that are the same once normalized have a score of 1, names normalized to nothing (e.g. "!!!") are left out.
+    Below a `threshold` of 1, the other normalized names are also compared with each other regardless of the order of
+    their words, but only within their blocks (see duplicate_blocks) and each with the DUPLICATE_WINDOW names around it
+    in the block, which keeps the number of comparisons close to linear in the number of names. Two names are similar
+    when their similarity reaches the threshold and the words they don't share are alike (see changed_words_match).
+
+    Each group is formed around a representative, the most common name not grouped yet, with the names similar to it.
+    A name only similar to names already grouped joins the group of the one it is most similar to.
+
+    Returns a DataFrame indexed like `names`, holding only the duplicates, with the 'group' number of each name
+    and its 'score', its similarity to the representative of its group (the best one of the group for the representative).
+    """
+    normalized = names.map(normalize_name)
+    counts = normalized[normalized != ''].value_counts()
+    keys = sorted(counts.index)
+    similar = {key: {} for key in keys}
+
+    if threshold < 1:
+        sorted_keys = {key: sort_words(key) for key in keys}
+        blocks = {}
+        for key in keys:
+            for block, order in duplicate_blocks(key, sorted_keys[key]):
+                blocks.setdefault(block, []).append((order, key))
+
+        positions = {key: [] for key in keys}
+        for block in blocks.values():
+            block.sort()
+            block[:] = [key for _, key in block]
+            for i, key in enumerate(block):
+                positions[key].append((block, i))
+
+        for key in keys:
+            # Each pair is compared once, from the name that sorts first, the window being the same seen from either name
+            candidates = set()
+            for block, i in positions[key]:
+                candidates.update(other for other in block[max(i - DUPLICATE_WINDOW, 0):i + DUPLICATE_WINDOW + 1] if other > key)
+            # Names are compared with their words sorted, so the order of the words does not matter. The matcher indexes
+            # the name once and is reused for all of its candidates.
+            matcher = SequenceMatcher(None, b=sorted_keys[key])
+            for other in candidates:
+                # The similarity can not reach the threshold if the lengths are too far apart
+                if 2 * min(len(key), len(other)) < threshold * (len(key) + len(other)):
+                    continue
+                matcher.set_seq1(sorted_keys[other])
+                if matcher.quick_ratio() < threshold:
+                    continue
+                score = matcher.ratio()
+                if score >= threshold and changed_words_match(key, other, threshold):
+                    similar[key][other] = similar[other][key] = score
+
+    groups = {}
+    scores = {}
+    for key in sorted(keys, key=lambda key: (-counts[key], -len(similar[key]), key)):
+        if key in groups or (counts[key] == 1 and not similar[key]):
+            continue
+        members = {other: score for other, score in similar[key].items() if other not in groups}
+        if not members and counts[key] == 1:
+            # Every name similar to it is already grouped
+            other = max(similar[key], key=similar[key].get)
+            groups[key] = groups[other]
+            scores[key] = similar[key][other]
+            continue
+        groups[key] = key
+        scores[key] = 1.0 if counts[key] > 1 else max(members.values())
+        for other, score in members.items():
+            groups[other] = key
+            scores[other] = 1.0 if counts[other] > 1 else score
+
+    duplicates = normalized[normalized.isin(groups.keys())]
+    group_numbers, _ = pd.factorize(duplicates.map(groups), sort=True)
+    return pd.DataFrame({'group': group_numbers + 1, 'score': duplicates.map(scores).round(2)}, index=duplicates.index)
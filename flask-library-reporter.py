@@ -1,21 +1,50 @@
 # Import libraries
 import os
+import atexit
 from datetime import datetime, timedelta
 import asyncio
+import threading
 import time
+import uuid
+import queue
 import base64
+import io
+import zipfile
 import json
+import hashlib
+import glob
+import statistics
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlencode
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 import aiohttp
 from dotenv import load_dotenv # run: pip install python-dotenv
-from flask import Flask, render_template,  jsonify, session, request, url_for, redirect, send_from_directory
+from flask import Flask, Response, render_template,  jsonify, session, request, url_for, redirect, send_from_directory, stream_with_context
 from markupsafe import escape
+from duplicate_names import find_duplicates
 
 # Define constants
 BASE_URL = 'https://bookstack.library.com/api' # THIS IS AN EXAMPLE
 MAX_ROWS_PER_FETCH = 500
 PROGRESS_BAR_MAX = 100
+PROGRESS_STREAM_INTERVAL = 0.5 # Seconds between two checks for progress changes to push to a progress stream
+PROGRESS_STREAM_KEEPALIVE = 15 # Seconds after which an idle progress stream is sent a comment, so proxies keep it open
+API_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+EXCEL_DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+EXCEL_WRITE_CHUNK_ROWS = 1000 # Rows of a report converted to Excel values at a time while its sheet is written
+
+# Formats the reports can be generated in, with the extension of their file. Every format other than xlsx is a zip archive
+# holding one file per sheet, for loading the reports into other tools.
+REPORT_FORMATS = {'xlsx': 'xlsx', 'parquet': 'parquet.zip', 'csv': 'csv.zip', 'ndjson': 'ndjson.zip'}
+DEFAULT_REPORT_FORMATS = ['xlsx']
 
 # Load environment variables depending on if script is running locally or via a server (platform.sh).
 local = False
@@ -25,12 +54,81 @@ except TypeError:
     local = True
     load_dotenv()
 
-def get_env(name):
+def get_env(name, default=None):
     if local:
-        return os.getenv(name)
+        return os.getenv(name, default)
     else:
-        return variables[name]
-    
+        return variables.get(name, default)
+
+# Maximum number of API requests that are allowed to be in flight at once during the async stages.
+MAX_CONCURRENT_REQUESTS = int(get_env('MAX_CONCURRENT_REQUESTS', 10))
+
+# Connection pool settings shared by the blocking and async HTTP sessions.
+HTTP_POOL_SIZE = int(get_env('HTTP_POOL_SIZE', MAX_CONCURRENT_REQUESTS))
+HTTP_CONNECT_TIMEOUT = float(get_env('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(get_env('HTTP_READ_TIMEOUT', 15))
+HTTP_KEEPALIVE_TIMEOUT = float(get_env('HTTP_KEEPALIVE_TIMEOUT', 30))
+
+# Request governor settings. Outside of low-impact hours requests are only limited by MAX_CONCURRENT_REQUESTS and MAX_REQUESTS_PER_SECOND (0 = no limit),
+# during low-impact hours (e.g. LOW_IMPACT_HOURS=9-17, server time) the lower low-impact limits apply.
+MAX_REQUESTS_PER_SECOND = float(get_env('MAX_REQUESTS_PER_SECOND', 0))
+LOW_IMPACT_HOURS = get_env('LOW_IMPACT_HOURS', '')
+LOW_IMPACT_MAX_CONCURRENT_REQUESTS = int(get_env('LOW_IMPACT_MAX_CONCURRENT_REQUESTS', 2))
+LOW_IMPACT_MAX_REQUESTS_PER_SECOND = float(get_env('LOW_IMPACT_MAX_REQUESTS_PER_SECOND', 5))
+MAX_RETRIES = int(get_env('MAX_RETRIES', 3))
+RATE_LIMIT_WINDOW = 60 # Bookstack's X-RateLimit-Limit is a number of requests per minute
+
+# Persistent API response cache, stored next to the reports so it survives restarts and deployments.
+# CACHE_TTLS holds the number of seconds the responses of each collection stay fresh (0 disables caching for that collection),
+# the detail endpoints of a collection (e.g. "pages/{id}") can be given their own TTL. The page details are not cached,
+# their tags are already kept by the page tag cache.
+CACHE_PATH = get_env('CACHE_PATH', './reports/reporter-cache.sqlite3')
+CACHE_MAX_BYTES = int(get_env('CACHE_MAX_BYTES', 256 * 1024 * 1024))
+CACHE_EVICTION_BATCH = 100 # Responses evicted at a time once the cache is over its size limit
+CACHE_TTLS = {'users': 3600, 'shelves': 900, 'books': 900, 'chapters': 900, 'pages': 900, 'pages/{id}': 0, 'attachments': 900}
+CACHE_TTLS.update(json.loads(get_env('CACHE_TTLS', '{}')))
+
+# Incremental sync keeps a local copy of the list endpoints and only downloads the records changed since the last sync.
+# Deleted records can only be noticed from a change in the total, so a full sync is still done every FULL_SYNC_MAX_AGE seconds.
+INCREMENTAL_SYNC = get_env('INCREMENTAL_SYNC', 'false').lower() == 'true'
+FULL_SYNC_MAX_AGE = float(get_env('FULL_SYNC_MAX_AGE', 7 * 24 * 60 * 60))
+SYNCED_COLLECTIONS = ['users', 'shelves', 'books', 'chapters', 'pages', 'attachments']
+
+# Timezone the times in the reports are shown in, e.g. America/New_York (the API returns UTC).
+DISPLAY_TIMEZONE = get_env('DISPLAY_TIMEZONE', 'UTC')
+
+# Address of the library site the links in the reports point to (defaults to BASE_URL without '/api').
+LIBRARY_URL = get_env('LIBRARY_URL', BASE_URL.removesuffix('/api')).rstrip('/')
+
+# Names are compared after removing case, accents, punctuation and extra spaces. Two names with a similarity (0 to 1) of at least
+# DUPLICATE_SIMILARITY_THRESHOLD are reported as duplicates, 1 only reports names that are the same once normalized.
+# The names are matched by find_duplicates in duplicate_names.py.
+DUPLICATE_SIMILARITY_THRESHOLD = float(get_env('DUPLICATE_SIMILARITY_THRESHOLD', 0.9))
+
+# Number of setup and report jobs run at the same time, and number of finished jobs whose status is kept,
+# the oldest are forgotten first.
+JOB_WORKERS = int(get_env('JOB_WORKERS', 2))
+JOB_HISTORY = int(get_env('JOB_HISTORY', 50))
+
+# Seconds the library data gathered by a setup job is kept for its reports, it is released if they are not requested by then.
+SETUP_RELEASE_TIMEOUT = float(get_env('SETUP_RELEASE_TIMEOUT', 30 * 60))
+
+# Number of report files kept in ./reports to be reused by runs on the same library data, the least recently used are deleted first.
+REPORT_CACHE_SIZE = int(get_env('REPORT_CACHE_SIZE', 20))
+# Version of the layout of the report files, part of their fingerprint. To be increased whenever the columns or formatting
+# of a report change, so the files generated by an earlier version are not reused.
+REPORT_LAYOUT_VERSION = 1
+
+# Cron expressions (minute hour day-of-month month day-of-week, server time) at which every report is generated in the background,
+# separated by ';', e.g. REPORT_SCHEDULE=0 2 * * * for every night at 02:00. The scheduler is turned off when empty.
+REPORT_SCHEDULE = get_env('REPORT_SCHEDULE', '')
+LATEST_REPORT_PATH = './reports/latest-report.json' # Report files of the latest scheduled run, offered on the home page
+
+# Number of reports of a run built at the same time, and number of processes matching the names of the duplicate reports
+# (0 matches them in the thread building the report, the default on a single core).
+REPORT_WORKERS = int(get_env('REPORT_WORKERS', 8))
+DUPLICATE_PROCESSES = int(get_env('DUPLICATE_PROCESSES', min(2, (os.cpu_count() or 1) - 1)))
+
 # Defining username and password constants
 USER_NAME = get_env('USER_NAME')
 PASSWORD = get_env('PASSWORD')
@@ -42,503 +140,1178 @@ HEADERS = {
     'Authorization': f'Token {TOKEN_ID}:{TOKEN_SECRET}',
     'Content-Type': 'application/json'
 }
+# Additional default headers can be given as a JSON object, e.g. HTTP_HEADERS={"User-Agent": "library-reporter"}
+HEADERS.update(json.loads(get_env('HTTP_HEADERS', '{}')))
 
-# Global Variables
-progress = {}
-shelfid_slugname_dict = {}
-shelfid_name_dict = {}
-bookid_shelfid_dict = {}
-bookid_slugname_dict = {}
-bookid_name_dict = {}
-chapterid_slugname_dict = {}
-chapterid_name_dict = {}
-chapterid_bookid_dict = {}
-userid_owner_dict = {}
-userid_email_dict = {}
-shelfid_ownerid_dict = {}
-bookid_ownerid_dict = {} 
-chapterid_ownerid_dict = {}
-pageid_name_dict = {}
-pageid_slug_dict = {}
-pageid_bookid_dict = {}
+def create_http_session(pool_size=HTTP_POOL_SIZE, headers=HEADERS):
+    # Creates a blocking session that keeps up to `pool_size` connections to the API alive between requests.
 
-def api_request(ep, count=MAX_ROWS_PER_FETCH):
-    # Sends a GET request to the specified API endpoint.
+    http_session = requests.Session()
+    http_session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    http_session.mount('https://', adapter)
+    http_session.mount('http://', adapter)
+    return http_session
+
+def create_async_session(pool_size=HTTP_POOL_SIZE, headers=HEADERS):
+    # Creates an aiohttp session with the same pool size, timeouts and headers as the blocking session.
+
+    connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT)
+    timeout = aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout)
+
+# Blocking session used by api_request
+http_session = create_http_session()
+
+# The async requests all run on one event loop in a background thread, so the aiohttp session and its open connections are kept between calls
+async_loop = asyncio.new_event_loop()
+threading.Thread(target=async_loop.run_forever, name='async-requests', daemon=True).start()
+async_session = None
+
+def run_async(coro):
+    # Runs a coroutine on the background event loop and blocks until it returns.
+
+    return asyncio.run_coroutine_threadsafe(coro, async_loop).result()
+
+async def get_async_session():
+    # Returns the shared aiohttp session, creating it on first use. Must be called from the background event loop.
+
+    global async_session
+    if async_session is None or async_session.closed:
+        async_session = create_async_session()
+    return async_session
+
+async def close_async_session():
+    # Closes the shared aiohttp session and its connections, if it was opened.
+
+    if async_session is not None and not async_session.closed:
+        await async_session.close()
+
+# Closing the session before exiting, which aiohttp would otherwise warn about
+atexit.register(lambda: run_async(close_async_session()))
+
+class RequestGovernor:
+    """
+    Paces the requests sent to the API so the reporter runs as fast as the library site allows without slowing it down for other users.
+
+    The number of requests allowed in flight is adapted AIMD-style: it grows by about one request per round of responses
+    while the server responds normally, and is cut down whenever the server answers with HTTP 429 or the rolling
+    median latency climbs well above the fastest latency seen. Bookstack's X-RateLimit-* headers are used to spread the
+    remaining requests of the rate limit window once half of it has been used up.
+
+    It is shared by the blocking and the async requests, so all of its state is guarded by a lock.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENT_REQUESTS, max_rate=MAX_REQUESTS_PER_SECOND, low_impact_hours=LOW_IMPACT_HOURS,
+                 low_impact_concurrency=LOW_IMPACT_MAX_CONCURRENT_REQUESTS, low_impact_rate=LOW_IMPACT_MAX_REQUESTS_PER_SECOND,
+                 latency_window=50, latency_tolerance=2.0):
+        self.lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.low_impact_hours = parse_hours(low_impact_hours)
+        self.low_impact_concurrency = low_impact_concurrency
+        self.low_impact_rate = low_impact_rate
+        self.latency_tolerance = latency_tolerance
+
+        self.limit = 1.0 # Current number of requests allowed in flight, starts low and grows while the server keeps up
+        self.in_flight = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.baseline_latency = None
+        self.last_decrease = 0.0
+        self.next_request_at = 0.0 # No request may start before this time (time.monotonic)
+        self.server_interval = 0.0 # Minimum seconds between requests asked for by the X-RateLimit-* headers
+
+    def ceiling(self):
+        # Returns the maximum concurrency and request rate allowed right now.
+        if datetime.now().hour in self.low_impact_hours:
+            return self.low_impact_concurrency, self.low_impact_rate
+        return self.max_concurrency, self.max_rate
+
+    def try_acquire(self):
+        # Claims a request slot, returns 0 when the request may be sent or else the number of seconds to wait before trying again.
+        with self.lock:
+            now = time.monotonic()
+            if now < self.next_request_at:
+                return self.next_request_at - now
+
+            max_concurrency, max_rate = self.ceiling()
+            if self.in_flight >= min(int(self.limit), max_concurrency):
+                return 0.02
+
+            interval = max(self.server_interval, 1 / max_rate if max_rate else 0)
+            self.in_flight += 1
+            self.next_request_at = now + interval
+            return 0
+
+    def acquire(self):
+        # Blocks the calling thread until a request may be sent.
+        while (wait := self.try_acquire()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        # Waits without blocking the event loop until a request may be sent.
+        while (wait := self.try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+    def release(self, status, headers, latency):
+        """
+        Records the outcome of a request and adapts the limits to it.
+
+        Returns the number of seconds to wait before retrying when the server rejected the request with HTTP 429, otherwise None.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            max_concurrency, _ = self.ceiling()
+
+            if status == 429:
+                retry_after = rate_limit_wait(headers)
+                self.decrease(now, 0.5)
+                self.next_request_at = max(self.next_request_at, now + retry_after)
+                return retry_after
+
+            # Spreads the requests left in the rate limit window once half of it has been used
+            if 'X-RateLimit-Limit' in headers and 'X-RateLimit-Remaining' in headers:
+                rate_limit = int(headers['X-RateLimit-Limit'])
+                remaining = int(headers['X-RateLimit-Remaining'])
+                self.server_interval = RATE_LIMIT_WINDOW / rate_limit if rate_limit and remaining < rate_limit / 2 else 0.0
+
+            if status is None or status >= 500:
+                # Errors and timeouts are treated as a sign of an overloaded server
+                self.decrease(now, 0.5)
+                return
+
+            self.latencies.append(latency)
+            median_latency = statistics.median(self.latencies)
+            if self.baseline_latency is None or median_latency < self.baseline_latency:
+                self.baseline_latency = median_latency
+            else:
+                # Lets the baseline slowly follow the server, so a single very fast response does not throttle the rest of the run
+                self.baseline_latency += (median_latency - self.baseline_latency) * 0.01
+
+            if median_latency > self.baseline_latency * self.latency_tolerance:
+                self.decrease(now, 0.75)
+            else:
+                self.limit = min(float(max_concurrency), self.limit + 1 / self.limit)
+            return
+
+    def decrease(self, now, factor):
+        # Multiplies the concurrency limit by `factor`, at most once per round trip so the responses of one burst are only punished once.
+        round_trip = statistics.median(self.latencies) if self.latencies else 1.0
+        if now - self.last_decrease > round_trip:
+            self.limit = max(1.0, self.limit * factor)
+            self.last_decrease = now
+
+def parse_hours(hours):
+    # Turns a range of hours like "9-17" into the set of hours it covers, an empty string gives an empty set.
+    if not hours:
+        return set()
+    start, end = (int(hour) for hour in hours.split('-'))
+    if start <= end:
+        return set(range(start, end))
+    return set(range(start, 24)) | set(range(0, end))
+
+def parse_cron(expression):
+    """
+    Parses a cron expression of 5 fields: minute, hour, day of the month, month and day of the week (0 or 7 being Sunday).
+    Each field is *, a number, a range (1-5) or a list of them (1,15), any of them with a step (*/15, 0-30/10).
+
+    Returns the set of values matched by each field, None for a day field left as * (see cron_matches).
+    """
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f'Invalid cron expression "{expression}", it needs 5 fields')
+
+    values = []
+    for field, (low, high) in zip(fields, [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]):
+        matched = set()
+        for part in field.split(','):
+            part_range, _, step = part.partition('/')
+            if part_range == '*':
+                start, end = low, high
+            elif '-' in part_range:
+                start, end = (int(value) for value in part_range.split('-'))
+            else:
+                # A single value with a step, like 5/15, runs up to the end of the field
+                start = int(part_range)
+                end = high if step else start
+            if not low <= start <= end <= high:
+                raise ValueError(f'Invalid cron expression "{expression}", {part} is not valid for values {low}-{high}')
+            matched.update(range(start, end + 1, int(step or 1)))
+        values.append(matched)
+
+    minutes, hours, days, months, weekdays = values
+    return [minutes, hours, None if fields[2] == '*' else days, months, None if fields[4] == '*' else {day % 7 for day in weekdays}]
+
+def cron_matches(schedule, moment):
+    # Returns whether a datetime falls on a minute of a schedule parsed by parse_cron.
+    minutes, hours, days, months, weekdays = schedule
+    if moment.minute not in minutes or moment.hour not in hours or moment.month not in months:
+        return False
+    weekday = moment.isoweekday() % 7
+    # As in cron, when both the day of the month and the day of the week are restricted, either of them matches
+    if days is not None and weekdays is not None:
+        return moment.day in days or weekday in weekdays
+    return (days is None or moment.day in days) and (weekdays is None or weekday in weekdays)
+
+def rate_limit_wait(headers):
+    # Returns how many seconds to wait after a HTTP 429 response, based on its Retry-After or X-RateLimit-Reset header.
+    if 'Retry-After' in headers:
+        return float(headers['Retry-After'])
+    if 'X-RateLimit-Reset' in headers:
+        return max(0.0, float(headers['X-RateLimit-Reset']) - time.time())
+    return float(RATE_LIMIT_WINDOW)
+
+# Request governor shared by every request sent to the API
+governor = RequestGovernor()
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of successful API responses, keyed by endpoint and query.
+
+    Each response is fresh for the TTL of its collection (the first part of the endpoint, e.g. "pages" for "pages/12"),
+    or of the collection's detail endpoints (e.g. "pages/{id}") when they have their own.
+    The size of the stored responses is kept as a running total, and once it grows past `max_bytes` the least recently
+    used ones are evicted in batches until the cache is back under 90% of it.
+    Calling force_refresh() makes every response stored before that moment stale, so the next run downloads everything again.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttls=CACHE_TTLS):
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.refreshed_at = 0.0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    collection TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            # Covers the eviction order and the sizes, so neither reads the stored bodies
+            self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at_size ON responses (accessed_at, size)")
+            self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(ep, params):
+        # Builds the cache key from the endpoint and its query, sorted so the order of the parameters does not matter.
+        return f'{ep}?{urlencode(sorted((params or {}).items()))}'
+
+    def ttl(self, ep):
+        collection, _, record_id = ep.partition('/')
+        if record_id and f'{collection}/{{id}}' in self.ttls:
+            return self.ttls[f'{collection}/{{id}}']
+        return self.ttls.get(collection, 0)
+
+    def get(self, ep, params):
+        # Returns the stored response of the request, or None if there is no fresh one.
+        ttl = self.ttl(ep)
+        if not ttl:
+            return
+
+        now = time.time()
+        key = self.key(ep, params)
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT body, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < max(now - ttl, self.refreshed_at):
+                return
+            self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, ep, params, data):
+        # Stores the response of the request, then evicts the least recently used responses while the cache is over its size limit.
+        if not self.ttl(ep):
+            return
 
-    response = requests.get(f'{BASE_URL}/{ep}', headers=HEADERS,  params={'count': count}, timeout=15) # Count is used to specify how many records will be returned in the response.
+        now = time.time()
+        key = self.key(ep, params)
+        body = json.dumps(data)
+        with self.lock, self.connection:
+            replaced = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", (key, ep.split('/')[0], body, len(body), now, now))
+            self.total_size += len(body) - (replaced[0] if replaced else 0)
+            if self.total_size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Evicts the least recently used responses, CACHE_EVICTION_BATCH at a time, until the cache is under 90% of its size limit.
+        # Must be called with the lock held, inside a transaction.
+        while self.total_size > self.max_bytes * 0.9:
+            batch = self.connection.execute("SELECT key, size FROM responses ORDER BY accessed_at LIMIT ?", (CACHE_EVICTION_BATCH,)).fetchall()
+            if not batch:
+                self.total_size = 0
+                return
+            self.connection.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in batch])
+            self.total_size -= sum(size for _, size in batch)
+
+    def force_refresh(self):
+        # Makes every response stored until now stale.
+        self.refreshed_at = time.time()
+
+# Response cache shared by every request sent to the API
+response_cache = ResponseCache()
+
+def api_request(ep, count=MAX_ROWS_PER_FETCH):
+    # Sends a GET request to the specified API endpoint, unless a fresh response is stored in the response cache.
+
+    cached = response_cache.get(ep, {'count': count})
+    if cached is not None:
+        return cached
+
+    for attempt in range(MAX_RETRIES + 1):
+        governor.acquire()
+        start = time.monotonic()
+        try:
+            response = http_session.get(f'{BASE_URL}/{ep}', params={'count': count}, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)) # Count is used to specify how many records will be returned in the response.
+        except requests.RequestException:
+            governor.release(None, {}, time.monotonic() - start)
+            raise
+        retry_after = governor.release(response.status_code, response.headers, time.monotonic() - start)
+
+        # Retries requests that were rejected by the rate limit, once the governor allows it
+        if retry_after is None or attempt == MAX_RETRIES:
+            break
 
     # Checks whether it was a succesful response or not
     if response.status_code == 200:
-        return response.json()
+        data = response.json()
+        response_cache.set(ep, {'count': count}, data)
+        return data
     else:
         print(f"\nFailed to fetch data from {BASE_URL}/{ep}.\n\nStatus code: {response.status_code}.\n\nError Message: {response.json()['error']['message']}\n")
         return
 
-def run_setup():
-    """
-    Initializes and populates various dictionaries with data from API endpoints.
-
-    This function sets up dictionaries to map:
-        - User ID to name and email
-        - Shelf ID to slug, name, and owner ID
-        - Book ID to shelf ID, slug, name, and owner ID
-        - Chapter ID to slug, name, book ID, and owner ID
-        - Page ID to name, slug, and book ID
-    """
-     
-    global shelfid_slugname_dict
-    global shelfid_name_dict 
-    global bookid_shelfid_dict
-    global bookid_name_dict
-    global bookid_slugname_dict
-    global chapterid_slugname_dict
-    global chapterid_name_dict
-    global chapterid_bookid_dict
-    global userid_owner_dict
-    global userid_email_dict
-    global shelfid_ownerid_dict
-    global bookid_ownerid_dict
-    global chapterid_ownerid_dict
-    global chapterid_ownerid_dict
-    global pageid_name_dict
-    global pageid_slug_dict
-    global pageid_bookid_dict 
-    
-    while True:
-        # User Dictionaries
-        setup_res = api_request('users', 1)
-        setup_total = setup_res['total']
-        initial_response = api_request('users', MAX_ROWS_PER_FETCH)
-        user_data = {
-            "data": initial_response['data'],
-            "total": initial_response['total']
-        }
-        setup_total -= MAX_ROWS_PER_FETCH
-
-        offset = MAX_ROWS_PER_FETCH
-        while setup_total > 0:
-            additional_response = api_request(f'users?offset={offset}', MAX_ROWS_PER_FETCH)
-            user_data['data'] = user_data['data'] + additional_response['data']
-            setup_total -= MAX_ROWS_PER_FETCH
-            offset += MAX_ROWS_PER_FETCH
-
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in user_data:
-            user_data = user_data['data'] 
-        else:
-            user_data = [user_data]  
-
-        progress['p0'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(user_data))
-        i = 0
-        for user in user_data:
-            userid_owner_dict[user['id']] = user['name']
-            userid_email_dict[user['id']] = user['email']
-            i += i_count
-            progress['p0'] = i
-
-        # Shelves Dictionaries
-        setup_res = api_request('shelves', 1)
-        setup_total = setup_res['total']
-        initial_response = api_request('shelves', MAX_ROWS_PER_FETCH)
-        shelves_data = {
-            "data": initial_response['data'],
-            "total": initial_response['total']
-        }
-        setup_total -= MAX_ROWS_PER_FETCH
-
-        offset = MAX_ROWS_PER_FETCH
-        while setup_total > 0:
-            additional_response = api_request(f'shelves?offset={offset}', MAX_ROWS_PER_FETCH)
-            shelves_data['data'] = shelves_data['data'] + additional_response['data']
-            setup_total -= MAX_ROWS_PER_FETCH
-            offset += MAX_ROWS_PER_FETCH
-
-        if shelves_data:
-            # Restructures json to return just a list rather than a list and the total number of records
-            if 'data' in shelves_data:
-                shelves_data = shelves_data['data'] 
-            else:
-                shelves_data = [shelves_data]  
-
-            shelf_ids = [item['id'] for item in shelves_data]
-            
-            progress['p1'] = 0
-            i_count = (PROGRESS_BAR_MAX / len(shelves_data))
-            i = 0
-            for shelf in shelves_data:
-                shelfid_slugname_dict[shelf['id']] = shelf['slug']
-                shelfid_name_dict[shelf['id']] = shelf['name']
-                shelfid_ownerid_dict[shelf['id']] = shelf['owned_by']
-                i += i_count
-                progress['p1'] = i
-        else:
+async def async_api_request(session, ep, params=None, use_cache=True):
+    # Async version of api_request, sends a GET request to the specified API endpoint using the shared aiohttp session.
+    # With `use_cache` unset the response cache is neither read nor written, for requests that must see the current data.
+
+    # The cache is read and written in the default executor, so its SQLite writes don't hold up the other requests on the event loop
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(None, response_cache.get, ep, params) if use_cache and response_cache.ttl(ep) else None
+    if cached is not None:
+        return cached
+
+    for attempt in range(MAX_RETRIES + 1):
+        await governor.acquire_async()
+        start = time.monotonic()
+        status, headers, data = None, {}, None
+        try:
+            async with session.get(f'{BASE_URL}/{ep}', params=params) as response:
+                status, headers = response.status, response.headers
+                # Checks whether it was a succesful response or not
+                if response.status == 200:
+                    data = await response.json()
+                elif response.status != 429 or attempt == MAX_RETRIES:
+                    print(f"\nFailed to fetch data from {BASE_URL}/{ep}.\n\nStatus code: {response.status}.\n\nError Message: {await response.text()}\n")
+                    return
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            print(f"\nFailed to fetch data from {BASE_URL}/{ep}.\n\nError Message: {error}\n")
             return
+        finally:
+            governor.release(status, headers, time.monotonic() - start)
 
-        # Book Dictionaries
-        progress['p2'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(shelf_ids))
-        i = 0
-        for id in shelf_ids:
-            shelf_data = api_request(f'shelves/{id}')
-            for book in shelf_data['books']:
-                if book['id'] in bookid_shelfid_dict:
-                    bookid_shelfid_dict[book['id']].append(id)
-                else:
-                    bookid_shelfid_dict[book['id']] = [id]
-            i += i_count
-            progress['p2'] = i
-        
-        books_data = api_request('books', 300)
-
-
-        setup_res = api_request('books', 1)
-        setup_total = setup_res['total']
-        initial_response = api_request('books', MAX_ROWS_PER_FETCH)
-        books_data = {
-            "data": initial_response['data'],
-            "total": initial_response['total']
-        }
-        setup_total -= MAX_ROWS_PER_FETCH
-
-        offset = MAX_ROWS_PER_FETCH
-        while setup_total > 0:
-            additional_response = api_request(f'books?offset={offset}', MAX_ROWS_PER_FETCH)
-            books_data['data'] = books_data['data'] + additional_response['data']
-            setup_total -= MAX_ROWS_PER_FETCH
-            offset += MAX_ROWS_PER_FETCH
-
-        if books_data:
-            # Restructures json to return just a list rather than a list and the total number of records
-            if 'data' in books_data:
-                books_data = books_data['data']  
-            else:
-                books_data = [books_data] 
-
-            progress['p3'] = 0
-            i_count = (PROGRESS_BAR_MAX / len(books_data))
-            i = 0
-            for book in books_data:
-                bookid_slugname_dict[book['id']] = book['slug']
-                bookid_name_dict[book['id']] = book['name']
-                bookid_ownerid_dict[book['id']] = book['owned_by']
-                i += i_count
-                progress['p3'] = i
-            
-        else:
+        if data is not None:
+            if use_cache and response_cache.ttl(ep):
+                await loop.run_in_executor(None, response_cache.set, ep, params, data)
+            return data
+
+async def map_concurrently(fn, items, on_result=None):
+    """
+    Runs the coroutine function `fn` over all `items` with a pool of MAX_CONCURRENT_REQUESTS workers and returns the results in order.
+
+    The request governor decides how many of these workers may actually have a request in flight at once.
+    `on_result` is called with each result as soon as it is ready.
+    """
+    results = [None] * len(items)
+    pending = iter(enumerate(items))
+
+    async def worker():
+        for index, item in pending:
+            results[index] = await fn(item)
+            if on_result:
+                on_result(results[index])
+
+    await asyncio.gather(*(worker() for _ in range(min(MAX_CONCURRENT_REQUESTS, len(items)))))
+    return results
+
+async def async_fetch_all(ep, params=None):
+    """
+    Fetches every record of a paginated list endpoint, `params` can hold additional query parameters such as filters.
+
+    The first request both returns the first batch of records and the total number of records,
+    the remaining offsets are then requested concurrently through map_concurrently.
+
+    Returns a list of all records in the order the API lists them, or None if any of the requests failed.
+    """
+    params = params or {}
+    session = await get_async_session()
+    initial_response = await async_api_request(session, ep, {**params, 'count': MAX_ROWS_PER_FETCH, 'offset': 0})
+    if not initial_response:
+        return
+
+    data = initial_response['data']
+    total = initial_response['total']
+
+    # The API may return less records per request than asked for, so the remaining offsets are based on the size of the first batch
+    batch_size = len(data)
+    if batch_size == 0 or batch_size >= total:
+        return data
+
+    async def fetch_offset(offset):
+        return await async_api_request(session, ep, {**params, 'count': batch_size, 'offset': offset})
+
+    additional_responses = await map_concurrently(fetch_offset, range(batch_size, total, batch_size))
+
+    for additional_response in additional_responses:
+        if not additional_response:
             return
-        
+        data += additional_response['data']
 
-        # Chapter Dictionaries
-        setup_res = api_request('chapters', 1)
-        setup_total = setup_res['total']
-        initial_response = api_request('chapters', MAX_ROWS_PER_FETCH)
-        chapters_data = {
-            "data": initial_response['data'],
-            "total": initial_response['total']
-        }
-        setup_total -= MAX_ROWS_PER_FETCH
-
-        offset = MAX_ROWS_PER_FETCH
-        while setup_total > 0:
-            additional_response = api_request(f'books?offset={offset}', MAX_ROWS_PER_FETCH)
-            chapters_data['data'] = chapters_data['data'] + additional_response['data']
-            setup_total -= MAX_ROWS_PER_FETCH
-            offset += MAX_ROWS_PER_FETCH
-
-        if chapters_data:
-            # Restructures json to return just a list rather than a list and the total number of records
-            if 'data' in chapters_data:
-                chapters_data = chapters_data['data']  
-            else:
-                chapters_data = [chapters_data]  
-
-            progress['p4'] = 0
-            i_count = (PROGRESS_BAR_MAX / len(chapters_data))
-            i = 0
-            for chapter in chapters_data:
-                chapterid_slugname_dict[chapter['id']] = chapter['slug']
-                chapterid_name_dict[chapter['id']] = chapter['name']
-                chapterid_ownerid_dict[chapter['id']] = chapter['owned_by']
-                chapterid_bookid_dict[chapter['id']] = chapter['book_id']
-
-                i += i_count
-                progress['p4'] = i
-        else:
+    return data
+
+def fetch_all(ep, params=None):
+    # Blocking wrapper around async_fetch_all, returns a list of all records from the specified list endpoint.
+
+    return run_async(async_fetch_all(ep, params))
+
+async def fetch_page_tags(session, page_id):
+    # Fetches a single page and formats its tags into a comma seperated string, the tags are None if the request failed.
+    # Pages are only fetched when edited since their tags were cached, so a response cached before the edit must not be used.
+
+    page_data = await async_api_request(session, f'pages/{page_id}', use_cache=False)
+
+    if page_data is None:
+        return page_id, None
+    elif 'tags' in page_data and page_data['tags']:
+        return page_id, ", ".join(tag['name'] for tag in page_data['tags'])
+    else:
+        return page_id, "No Tag(s)"
+
+async def gather_page_tags(progress, page_ids):
+    """
+    Fetches the tags of every page concurrently through map_concurrently, counting them in the `progress` of the run.
+
+    Returns a dictionary mapping each page id to its formatted tags string, or to None if its request failed.
+    """
+    session = await get_async_session()
+
+    progress['p6'] = 0
+    i_count = (PROGRESS_BAR_MAX / len(page_ids))
+
+    def update_progress(result):
+        progress['p6'] += i_count
+
+    results = await map_concurrently(lambda page_id: fetch_page_tags(session, page_id), page_ids, update_progress)
+
+    return dict(results)
+
+class ShelfIndex:
+    """
+    Shelf membership of the library in both directions, built once per run from the shelf details.
+
+    `shelf_books` maps each shelf id to the ids of the books on it, `book_shelves` maps each shelved book id
+    to the ids of the shelves it is on, in the same order as the shelves are listed.
+    """
+
+    def __init__(self, shelf_books):
+        self.shelf_books = shelf_books
+        self.book_shelves = {}
+        for shelf_id, book_ids in shelf_books.items():
+            for book_id in book_ids:
+                self.book_shelves.setdefault(book_id, []).append(shelf_id)
+
+# Attributes of each kind of entity looked up by id by the reports, kept in its EntityStore
+ENTITY_COLUMNS = {
+    'users': ['name', 'email'],
+    'shelves': ['slug', 'name', 'owned_by'],
+    'books': ['slug', 'name', 'owned_by'],
+    'chapters': ['slug', 'name', 'owned_by', 'book_id'],
+    'pages': ['name', 'slug', 'book_id'],
+}
+
+class EntityStore:
+    """
+    Attributes of every entity of one kind (see ENTITY_COLUMNS), held as one DataFrame indexed by id.
+
+    The columns reference the strings of the snapshot's records instead of copying them into a dictionary per attribute,
+    and a whole column of ids is looked up at once with `gather`. A record listed twice, e.g. when the records shifted
+    between the pages of a paginated download, is kept once with its last listed attributes.
+    """
+
+    def __init__(self, data, columns):
+        self.table = pd.DataFrame(data, columns=['id'] + columns).drop_duplicates('id', keep='last').set_index('id')
+        # The hash table of an index is built on its first lookup, which is not thread safe
+        self.table.index.is_unique
+
+    def __len__(self):
+        return len(self.table)
+
+    def gather(self, ids, column):
+        # Returns the `column` of each id of a Series of ids, aligned with it, NaN for unknown ids.
+        return ids.map(self.table[column])
+
+async def fetch_shelf_books(session, shelf_id):
+    # Fetches a single shelf and returns the ids of the books on it, or None if the request failed.
+
+    shelf_data = await async_api_request(session, f'shelves/{shelf_id}')
+
+    if shelf_data is None:
+        return
+    return [book['id'] for book in shelf_data['books']]
+
+async def gather_shelf_books(progress, shelf_ids):
+    """
+    Fetches the books on every shelf concurrently through map_concurrently, counting them in the `progress` of the run.
+
+    Returns a dictionary mapping each shelf id to the ids of its books, or None if any of the requests failed.
+    """
+    session = await get_async_session()
+
+    progress['p2'] = 0 if shelf_ids else PROGRESS_BAR_MAX
+    i_count = (PROGRESS_BAR_MAX / max(len(shelf_ids), 1))
+
+    def update_progress(result):
+        progress['p2'] += i_count
+
+    results = await map_concurrently(lambda shelf_id: fetch_shelf_books(session, shelf_id), shelf_ids, update_progress)
+
+    if any(book_ids is None for book_ids in results):
+        return
+    return dict(zip(shelf_ids, results))
+
+class PageTagCache:
+    """
+    Persistent cache of the formatted tags of each page.
+
+    Tags are only returned by the per-page endpoint, so they are stored together with the page's revision_count
+    and updated_at from the pages list. A stored entry is only used while both still match the list,
+    so only pages that were edited since they were cached need to be fetched again.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS page_tags (
+                    page_id INTEGER PRIMARY KEY,
+                    revision_count INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    tags TEXT NOT NULL
+                )""")
+
+    def get_many(self, pages):
+        # Returns a dictionary of page id to formatted tags for each of the given pages that has an up to date entry.
+        with self.lock:
+            stored = {row[0]: row[1:] for row in self.connection.execute("SELECT page_id, revision_count, updated_at, tags FROM page_tags")}
+
+        pageid2tags = {}
+        for page in pages:
+            entry = stored.get(page['id'])
+            if entry and entry[0] == page['revision_count'] and entry[1] == page['updated_at']:
+                pageid2tags[page['id']] = entry[2]
+        return pageid2tags
+
+    def set_many(self, pages, pageid2tags):
+        # Stores the formatted tags of the given pages, pages without tags in pageid2tags are skipped.
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO page_tags VALUES (?, ?, ?, ?)",
+                                        [(page['id'], page['revision_count'], page['updated_at'], pageid2tags[page['id']])
+                                         for page in pages if pageid2tags.get(page['id']) is not None])
+
+# Tags of the pages, reused until a page gets a new revision
+page_tag_cache = PageTagCache()
+
+class CollectionStore:
+    """
+    Locally persisted copy of the list endpoints, kept up to date by incremental syncs.
+
+    After a full download of a collection, later syncs only request the records with an updated_at at or after the
+    newest updated_at already stored and merge them into the stored copy. The API's total is then compared with the
+    number of stored records, and a mismatch (a record was deleted) falls back to a full download.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS collection_rows (
+                    collection TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (collection, id)
+                )""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    collection TEXT PRIMARY KEY,
+                    full_synced_at REAL NOT NULL
+                )""")
+
+    def rows(self, collection):
+        # Returns the stored records of a collection, ordered by id.
+        with self.lock:
+            rows = self.connection.execute("SELECT body FROM collection_rows WHERE collection = ? ORDER BY id", (collection,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def last_updated_at(self, collection):
+        # Returns the newest updated_at of the stored records, or None if the collection was never fully synced.
+        with self.lock:
+            state = self.connection.execute("SELECT full_synced_at FROM sync_state WHERE collection = ?", (collection,)).fetchone()
+            if state is None or time.time() - state[0] > FULL_SYNC_MAX_AGE:
+                return
+            return self.connection.execute("SELECT MAX(updated_at) FROM collection_rows WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def merge(self, collection, data, full=False):
+        # Stores the given records, a full sync first removes every record that is no longer in the collection.
+        with self.lock, self.connection:
+            if full:
+                self.connection.execute("DELETE FROM collection_rows WHERE collection = ?", (collection,))
+                self.connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (collection, time.time()))
+            self.connection.executemany("INSERT OR REPLACE INTO collection_rows VALUES (?, ?, ?, ?)",
+                                        [(collection, row['id'], row['updated_at'], json.dumps(row)) for row in data])
+
+    def sync(self, collection, full=False):
+        # Brings the stored copy of a collection up to date and returns its records, or None if a request failed.
+        last_updated_at = None if full else self.last_updated_at(collection)
+
+        if last_updated_at is None:
+            data = fetch_all(collection)
+            if data is None:
+                return
+            self.merge(collection, data, full=True)
+            return self.rows(collection)
+
+        # The API compares against the database's format, records updated in the same second as the newest one are downloaded again
+        changed = fetch_all(collection, {'filter[updated_at:gte]': last_updated_at[:19].replace('T', ' ')})
+        total_response = api_request(collection, 1)
+        if changed is None or total_response is None:
             return
-        
-        # Pages Dictionaries
-        setup_res = api_request('pages', 1)
-        setup_total = setup_res['total']
-        initial_response = api_request('pages', MAX_ROWS_PER_FETCH)
-        pages_data = {
-            "data": initial_response['data'],
-            "total": initial_response['total']
-        }
-        setup_total -= MAX_ROWS_PER_FETCH
-
-        offset = MAX_ROWS_PER_FETCH
-        while setup_total > 0:
-            additional_response = api_request(f'pages?offset={offset}', MAX_ROWS_PER_FETCH)
-            pages_data['data'] = pages_data['data'] + additional_response['data']
-            setup_total -= MAX_ROWS_PER_FETCH
-            offset += MAX_ROWS_PER_FETCH
-
-        if pages_data:
-            # Restructures json to return just a list rather than a list and the total number of records
-            if 'data' in pages_data:
-                pages_data = pages_data['data']  
+        self.merge(collection, changed)
+
+        data = self.rows(collection)
+        if len(data) != total_response['total']:
+            return self.sync(collection, full=True)
+        return data
+
+# Local copy of the list endpoints used when INCREMENTAL_SYNC is turned on
+collection_store = CollectionStore()
+
+class LibrarySnapshot:
+    """
+    Holds the records of each list endpoint for the duration of one run, so every endpoint is downloaded once
+    and the same records are shared by the setup and all the reports.
+
+    With INCREMENTAL_SYNC turned on, the records come from the collection store which only downloads what changed
+    since the last run, unless `force_refresh` is set. The shelf details fetched for the shelf index are counted in `progress`.
+    """
+
+    def __init__(self, progress, force_refresh=False):
+        self.progress = progress
+        self.force_refresh = force_refresh
+        self.collections = {}
+        self.shelf_membership = None
+        self.shelf_labels = None
+        self.lock = threading.Lock() # The reports of a run are built at the same time, the labels they share are built once
+
+    def load(self, ep):
+        # Returns the records of a list endpoint, downloading them on first use. These records are shared and should not be modified.
+        if ep not in self.collections:
+            if INCREMENTAL_SYNC and ep in SYNCED_COLLECTIONS:
+                data = collection_store.sync(ep, full=self.force_refresh)
             else:
-                pages_data = [pages_data]  
-
-            progress['p5'] = 0
-            i_count = (PROGRESS_BAR_MAX / len(pages_data))
-            i = 0
-            for page in pages_data:
-                pageid_name_dict[page['id']] = page['name']
-                pageid_slug_dict[page['id']] = page['slug']
-                pageid_bookid_dict[page['id']] = page['book_id']
-
-                i += i_count
-                progress['p5'] = i
-        else:
+                data = fetch_all(ep)
+            if data is None:
+                return
+            self.collections[ep] = data
+        return self.collections[ep]
+
+    def rows(self, ep):
+        # Returns a copy of each record of a list endpoint, so a report can reformat them without changing the snapshot.
+        data = self.load(ep)
+        if data is None:
             return
+        return [dict(row) for row in data]
+
+    def shelf_index(self):
+        # Returns the ShelfIndex of the library, fetching the details of every shelf on first use.
+        if self.shelf_membership is None:
+            shelves_data = self.load('shelves')
+            if shelves_data is None:
+                return
+            shelf_books = run_async(gather_shelf_books(self.progress, [shelf['id'] for shelf in shelves_data]))
+            if shelf_books is None:
+                return
+            self.shelf_membership = ShelfIndex(shelf_books)
+        return self.shelf_membership
+
+    def shelves_labels(self):
+        # Returns the 'Shelves' label of each book as a Series indexed by book id, built once per run from the shelf index.
+        # Books that are not on any shelf are left out.
+        with self.lock:
+            if self.shelf_labels is None:
+                shelf_index = self.shelf_index()
+                if shelf_index is None:
+                    return
+                shelves = pd.DataFrame(self.load('shelves'), columns=['id', 'name', 'slug']).set_index('id')
+                memberships = pd.DataFrame(
+                    [(book_id, shelf_id) for book_id, shelf_ids in shelf_index.book_shelves.items() for shelf_id in shelf_ids],
+                    columns=['book_id', 'shelf_id'])
+                labels = (memberships['shelf_id'].map(shelves['name']).astype(str) + ': '
+                          + library_urls('shelves', memberships['shelf_id'].map(shelves['slug']).astype(str)))
+                self.shelf_labels = labels.groupby(memberships['book_id'], sort=False).agg(', '.join)
+                # The hash table of an index is built on its first lookup, which is not thread safe
+                self.shelf_labels.index.is_unique
+        return self.shelf_labels
+
+class RunContext:
+    """
+    State of one run of the reporter, a setup job followed by a report job, kept apart from the other runs so several
+    people can run the reports at the same time.
 
-        return
+    It owns the reports selected for the run, the progress counters shown on the home page, the snapshot and entity
+    stores populated by the setup and used by the reports, and the names of the report files of the run.
+    """
 
-def run_reports():
+    def __init__(self, reports=None, run_id=None):
+        self.id = run_id or uuid.uuid4().hex
+        # Keys of the REPORTS generated by the run, all of them by default, and what they need from the library
+        self.reports = [key for key in REPORTS if reports is None or key in reports]
+        self.plan = plan_run(self.reports)
+        self.progress = {}
+        self.snapshot = None # LibrarySnapshot of the run, created by run_setup
+        self.report_files = [] # Names of the report files of the run in ./reports
+        self.incomplete = False # Set when a report is built with missing data, e.g. the tags of a page could not be fetched
+        self.release()
+
+    def release(self):
+        # Frees the records and entity stores of a finished run, its progress and report files are kept.
+        self.snapshot = None
+        self.entities = {} # EntityStore of each kind needed by the reports, created by run_setup
+
+class ReportError(Exception):
     """
-    Generates one excel file by retrieving all dataframes from each reporting function, 
-    then seperating each by giving a unique sheet name.
+    Raised by a report when it can not be built, its message is shown as the error of the report job.
     """
-    pages_df = formatted_pages_report() 
-    attachments_df = attachments_report()
-    books_df = books_report()
-    duplicate_books_df = duplicate_books_report()
-    unshelved_books_df = unshelved_books_report()
-    chapters_df = chapters_report()
-    duplicate_pages_df = duplicate_pages_report()
-    shelves_df = shelves_report()
-    users_df = users_report()
-    
 
-    # Using ExcelWriter to write dataframes to separate sheets
-    with pd.ExcelWriter(f"./reports/library-report.xlsx", engine='openpyxl') as writer:
-        pages_df.to_excel(writer, sheet_name="Pages", index=False)
-        attachments_df.to_excel(writer, sheet_name="Attachments", index=False)
-        chapters_df.to_excel(writer, sheet_name="Chapters", index=False)
-        books_df.to_excel(writer, sheet_name="Books", index=False)
-        shelves_df.to_excel(writer, sheet_name="Shelves", index=False)
-        users_df.to_excel(writer, sheet_name="Users", index=False)
-        duplicate_books_df.to_excel(writer, sheet_name="Duplicate Books", index=False)
-        unshelved_books_df.to_excel(writer, sheet_name="Unshelved Books", index=False)
-        duplicate_pages_df.to_excel(writer, sheet_name="Duplicate Pages", index=False)
-
-    time.sleep(2)
-    progress.clear()
+# Name and email columns added to most reports for the owner, creator and updater of each record.
+# Each id column maps to (name column, email column, name used if the user is unknown, email used if the user is unknown).
+OWNER_CREATOR_UPDATER_COLUMNS = {
+    'owned_by': ('Owner', 'Owner Email', 'No Owner Found', 'No Owner Email Found'),
+    'created_by': ('Creator', 'Creator Email', 'No Creator Found', 'No Creator Email Found'),
+    'updated_by': ('Updater', 'Updater Email', 'No Updater Found', 'No Updater Found'),
+}
+
+def library_urls(*segments):
+    """
+    Builds links to the library site for a whole column at once.
+
+    Each segment is either a string or a Series of slugs, they are joined with '/' after LIBRARY_URL,
+    e.g. library_urls('books', df['book_slug'], 'page', df['slug']).
+    """
+    urls = LIBRARY_URL
+    for segment in segments:
+        urls = urls + '/' + segment
+    return urls
+
+def hyperlink(urls):
+    # Wraps a column of URLs into Excel HYPERLINK formulas.
+    return '=HYPERLINK("' + urls + '")'
+
+def attach_shelves_column(context, df, id_column='id'):
+    """
+    Adds the 'Shelves' column, listing the name and link of every shelf a book is on, to a report's DataFrame.
+
+    The labels are built once per book by the snapshot and looked up through the book id column,
+    so rows of the same book share the same label.
+    """
+    df['Shelves'] = df[id_column].map(context.snapshot.shelves_labels()).fillna('No shelves found')
+    return df
+
+def normalize_timestamps(df, columns):
+    """
+    Parses API timestamp columns of a report's DataFrame, a whole column at a time.
+
+    The times are converted to DISPLAY_TIMEZONE and rounded down to the second. They are kept as real (timezone naive,
+    since Excel has no timezones) datetimes so the sheets can be sorted and filtered by date, missing times stay empty.
+    """
+    for column in columns:
+        timestamps = pd.to_datetime(df[column], format=API_TIMESTAMP_FORMAT, utc=True)
+        df[column] = timestamps.dt.tz_convert(DISPLAY_TIMEZONE).dt.tz_localize(None).dt.floor('s')
+    return df
+
+def attach_user_columns(context, df, columns):
+    """
+    Adds the name and email of the users referenced by user id columns of a report's DataFrame.
+
+    `columns` maps each user id column to (name column, email column, name fill value, email fill value),
+    the fill values are used for ids that do not match any user. The lookups are done per column with the user store
+    of the run, instead of per row.
+    """
+    users = context.entities['users'].table
+    for id_column, (name_column, email_column, name_fill, email_fill) in columns.items():
+        df[name_column] = df[id_column].map(users['name']).fillna(name_fill)
+        df[email_column] = df[id_column].map(users['email']).fillna(email_fill)
+    return df
+
+# Processes running find_duplicates, started on first use
+duplicate_pool = None
+duplicate_pool_lock = threading.Lock()
+
+def match_duplicates(names):
+    # Runs find_duplicates in the duplicate process pool. The matching is pure Python, in a thread it would hold the GIL
+    # and slow down the other reports being built at the same time. The processes only import duplicate_names.py.
+    global duplicate_pool
+    if DUPLICATE_PROCESSES < 1:
+        return find_duplicates(names, DUPLICATE_SIMILARITY_THRESHOLD)
+    with duplicate_pool_lock:
+        if duplicate_pool is None:
+            # Spawned rather than forked, forking a process running threads can leave their locks held in the child
+            duplicate_pool = ProcessPoolExecutor(DUPLICATE_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+    return duplicate_pool.submit(find_duplicates, names, DUPLICATE_SIMILARITY_THRESHOLD).result()
+
+def attach_duplicate_columns(df):
+    """
+    Keeps only the rows of a report's DataFrame whose 'name' is a duplicate (see find_duplicates),
+    adds their 'Duplicate Group' and 'Similarity' and sorts them by group and name.
+    """
+    duplicates = match_duplicates(df['name'])
+    df = df.loc[duplicates.index]
+    df['Duplicate Group'] = duplicates['group']
+    df['Similarity'] = duplicates['score']
+    return df.sort_values(by=['Duplicate Group', 'name'])
+
+def run_setup(context, force_refresh=False):
+    """
+    Initializes and populates the entity stores of the run with data from API endpoints.
+
+    Only the endpoints and entity stores needed by the reports of the run (see plan_run) are fetched and populated,
+    the progress bars of the other steps are filled at once.
+    Responses stored in the response cache are reused while they are fresh, unless `force_refresh` is set.
+    Returns True once every entity store is populated, or False if the library data could not be gathered.
+
+    This function sets up an entity store (see ENTITY_COLUMNS) of:
+        - Users, with their name and email
+        - Shelves, with their slug, name, and owner ID
+        - Books, with their slug, name, and owner ID
+        - Chapters, with their slug, name, book ID, and owner ID
+        - Pages, with their name, slug, and book ID
+    The shelves of each book are found through the shelf index of the snapshot.
+    """
+
+    if force_refresh:
+        response_cache.force_refresh()
+
+    # Every run starts from a fresh snapshot so the reports reflect the current state of the library
+    context.snapshot = LibrarySnapshot(context.progress, force_refresh)
+
+    for need, progress_id in [('users', 'p0'), ('shelves', 'p1'), ('shelf_index', 'p2'), ('books', 'p3'), ('chapters', 'p4'), ('pages', 'p5')]:
+        # Steps not needed by the reports of the run are skipped
+        if need not in context.plan:
+            context.progress[progress_id] = PROGRESS_BAR_MAX
+            continue
+
+        # Shelf index, its progress is counted while the details of the shelves are fetched
+        if need == 'shelf_index':
+            if not context.snapshot.shelf_index():
+                return False
+            continue
+
+        # Entity store, a library can have no users other than the API's but every other kind can't be empty
+        context.progress[progress_id] = 0
+        data = context.snapshot.load(need)
+        if data is None or (not data and need != 'users'):
+            return False
+        context.entities[need] = EntityStore(data, ENTITY_COLUMNS[need])
+        context.progress[progress_id] = PROGRESS_BAR_MAX
+
+    return True
+
+def write_sheet(workbook, sheet_name, df):
+    """
+    Appends a report's DataFrame to a write-only workbook as a new sheet, the same way DataFrame.to_excel would:
+    a bold, bordered and centered header row, datetimes shown with EXCEL_DATETIME_FORMAT and missing values left empty.
+
+    The rows are streamed to the sheet EXCEL_WRITE_CHUNK_ROWS at a time, so no cell objects are kept in memory.
+    """
+    worksheet = workbook.create_sheet(sheet_name)
+    thin = Side(style='thin')
+
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        header.append(cell)
+    worksheet.append(header)
+
+    datetime_columns = [i for i, dtype in enumerate(df.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)]
+    for start in range(0, len(df), EXCEL_WRITE_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXCEL_WRITE_CHUNK_ROWS].astype(object)
+        chunk = chunk.where(chunk.notna(), '')
+        for row in chunk.itertuples(index=False, name=None):
+            row = list(row)
+            for i in datetime_columns:
+                if row[i] != '':
+                    row[i] = WriteOnlyCell(worksheet, value=row[i].to_pydatetime())
+                    row[i].number_format = EXCEL_DATETIME_FORMAT
+            worksheet.append(row)
+
+class ExcelReportWriter:
+    """
+    Writes the reports to the sheets of one Excel workbook at `path`, each as soon as it is written (see write_sheet).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+
+    def write(self, sheet_name, df):
+        write_sheet(self.workbook, sheet_name, df)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+class BundleReportWriter:
+    """
+    Writes the reports to a zip archive at `path` holding one file per sheet, in the 'parquet', 'csv' or 'ndjson' format.
+
+    The Excel HYPERLINK formulas of the reports are replaced by their plain URL, and each file is named after its sheet,
+    e.g. duplicate-books.csv.
+    """
+
+    def __init__(self, path, report_format):
+        self.report_format = report_format
+        # Parquet files are already compressed
+        compression = zipfile.ZIP_STORED if report_format == 'parquet' else zipfile.ZIP_DEFLATED
+        self.archive = zipfile.ZipFile(path, 'w', compression=compression)
+
+    def write(self, sheet_name, df):
+        df = plain_urls(df)
+        with self.archive.open(f"{sheet_name.lower().replace(' ', '-')}.{self.report_format}", 'w') as file:
+            if self.report_format == 'parquet':
+                df.to_parquet(file, index=False)
+            else:
+                with io.TextIOWrapper(file, encoding='utf-8', newline='') as text_file:
+                    if self.report_format == 'csv':
+                        df.to_csv(text_file, index=False)
+                    else:
+                        df.to_json(text_file, orient='records', lines=True, date_format='iso')
+
+    def close(self):
+        self.archive.close()
+
+def plain_urls(df):
+    # Returns a copy of a report's DataFrame where the Excel HYPERLINK formulas are replaced by their URL.
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        is_hyperlink = df[column].str.startswith('=HYPERLINK("', na=False)
+        if is_hyperlink.any():
+            df[column] = df[column].where(~is_hyperlink, df[column].str.slice(len('=HYPERLINK("'), -len('")')))
+    return df
+
+def snapshot_fingerprint(context):
+    """
+    Returns a fingerprint of the library data the reports of a run are generated from, or None if it could not be gathered.
+
+    For each collection the reports need, the fingerprint covers its number of records, its newest updated_at and a hash
+    of its ids, which change when a record is added, edited or deleted. The newest last_activity_at of the users is only
+    covered when the Users report, which shows it, is part of the run, so user activity alone doesn't change the others.
+    It also covers the books on each shelf, the reports of the run, the settings that change their content and REPORT_LAYOUT_VERSION.
+    """
+    parts = {'layout': REPORT_LAYOUT_VERSION, 'reports': context.reports, 'settings': [LIBRARY_URL, DISPLAY_TIMEZONE, DUPLICATE_SIMILARITY_THRESHOLD]}
+    activity = 'users' in context.reports
+    for ep in sorted(context.plan & set(SYNCED_COLLECTIONS)):
+        data = context.snapshot.load(ep)
+        if data is None:
+            return
+        ids = ','.join(str(record_id) for record_id in sorted(row['id'] for row in data))
+        newest = max((max(row['updated_at'], (activity and row.get('last_activity_at')) or '') for row in data), default=None)
+        parts[ep] = [len(data), newest, hashlib.sha256(ids.encode()).hexdigest()]
+    if 'shelf_index' in context.plan:
+        parts['shelf_index'] = sorted((shelf_id, sorted(book_ids)) for shelf_id, book_ids in context.snapshot.shelf_index().shelf_books.items())
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def report_filename(fingerprint, report_format):
+    # Returns the name of the report file generated in a format from the library data with the given fingerprint,
+    # the hash in its name is also its ETag.
+    key = hashlib.sha256(f'{fingerprint}:{report_format}'.encode()).hexdigest()[:32]
+    return f'library-report-{key}.{REPORT_FORMATS[report_format]}'
+
+# Held while report files are pruned, so the report jobs running at the same time don't delete the same files
+report_files_lock = threading.Lock()
+
+def prune_report_files(keep=REPORT_CACHE_SIZE):
+    # Deletes the least recently used report files beyond the `keep` most recent ones, files still being written are left alone.
+    with report_files_lock:
+        paths = [path for path in glob.glob('./reports/library-report-*') if not path.endswith('.part')]
+        for path in sorted(paths, key=os.path.getmtime, reverse=True)[keep:]:
+            os.remove(path)
+
+def run_reports(context, formats=DEFAULT_REPORT_FORMATS):
+    """
+    Generates one excel file by retrieving all dataframes from each reporting function selected for the run,
+    then seperating each by giving a unique sheet name. The reports can also, or instead, be generated in
+    the other REPORT_FORMATS. Returns the names of the files of the run in ./reports, one per format,
+    or False if the library data could not be gathered.
+
+    Each file is named after the fingerprint of the library data it was generated from (see snapshot_fingerprint),
+    so a run on unchanged data reuses the file generated earlier and finishes without building the reports again.
+    Files built with missing data (see RunContext.incomplete) are named after the run instead, so they are never reused.
+
+    The reports are built at the same time by up to REPORT_WORKERS threads: fetching page tags and attachments waits on the API,
+    and matching duplicate names runs in separate processes, so the run takes about as long as its slowest report.
+    The reports are written in the order of their sheets, each as soon as it is ready, and freed once written.
+    """
+
+    # The library data of the run is released if its reports were not requested in time after the setup
+    if context.snapshot is None:
+        return False
+
+    fingerprint = snapshot_fingerprint(context)
+    if fingerprint is None:
+        return False
+
+    # Using a write-only workbook, or archive, per format to stream each dataframe to its own sheet.
+    # The files are written under a temporary name and only get their own once complete.
+    writers = {}
+    for report_format in formats:
+        filename = report_filename(fingerprint, report_format)
+        context.report_files.append(filename)
+        if os.path.exists(f"./reports/{filename}"):
+            # Reusing the file generated earlier from the same library data
+            os.utime(f"./reports/{filename}")
+            continue
+        part_path = f"./reports/{filename}.{context.id}.part"
+        if report_format == 'xlsx':
+            writers[filename] = ExcelReportWriter(part_path)
+        else:
+            writers[filename] = BundleReportWriter(part_path, report_format)
+
+    if writers:
+        try:
+            with ThreadPoolExecutor(max(min(REPORT_WORKERS, len(context.reports)), 1), thread_name_prefix='report-builder') as executor:
+                futures = {key: executor.submit(REPORTS[key]['build'], context) for key in context.reports}
+                try:
+                    for key in context.reports:
+                        df = futures.pop(key).result()
+                        for writer in writers.values():
+                            writer.write(REPORTS[key]['sheet'], df)
+                except BaseException:
+                    # A failed report fails the run, the reports not started yet are dropped
+                    executor.shutdown(cancel_futures=True)
+                    raise
+        except BaseException:
+            # The files of a failed run are closed, then removed below
+            for writer in writers.values():
+                writer.close()
+            raise
+        else:
+            for filename, writer in writers.items():
+                writer.close()
+                if context.incomplete:
+                    # Files built with missing data get a name of their own, so later runs on the same library data
+                    # build them again instead of reusing them
+                    published = f"library-report-incomplete-{context.id}.{filename.split('.', 1)[1]}"
+                    context.report_files[context.report_files.index(filename)] = published
+                else:
+                    published = filename
+                os.replace(f"./reports/{filename}.{context.id}.part", f"./reports/{published}")
+        finally:
+            for filename in writers:
+                if os.path.exists(f"./reports/{filename}.{context.id}.part"):
+                    os.remove(f"./reports/{filename}.{context.id}.part")
+    else:
+        for key in context.reports:
+            for progress_id in REPORTS[key]['progress']:
+                context.progress[progress_id] = PROGRESS_BAR_MAX
+    prune_report_files()
+
+    # Releasing the records of the finished run
+    context.release()
     
-    return
+    return context.report_files
 
-def formatted_pages_report():
+def formatted_pages_report(context):
     """
     Generates a detailed report on pages, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all pages data from the API in batches.
-    2. Collects tags for each page asynchronously.
+    1. Gets all pages data from the snapshot of the current run.
+    2. Collects tags for each page edited since its tags were cached, asynchronously with a bounded number of concurrent requests.
     3. Constructs URLs and gathers detailed information (names, emails) for shelves, books, chapters, and pages.
     4. Formats tags and other attributes for readability.
     5. Transposes the collected data into a pandas DataFrame.
     6. Reorders and renames columns for clarity and drops unnecessary columns.
     """
     
-    setup_res = api_request('pages', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('pages', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'pages?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
-
-    shelves_arr = []
-    book_slug_arr = []
-    book_name_arr = []
-    chapter_slug_arr = []
-    chapter_name_arr = []
-    formatted_tags_arr = []
-    book_owner_arr = []
-    chapter_owner_arr = []
-    page_owner_arr = []
-    page_creator_arr = []
-    page_updater_arr = []
-    book_owneremail_arr = []
-    chapter_owneremail_arr = []
-    page_owneremail_arr = []
-    page_creatoremail_arr = []
-    page_updateremail_arr = []
+    data = context.snapshot.rows('pages')
     
     if data:
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']  
+        # Reuses the cached tags of pages that were not edited since, and gathers the tags of the other pages concurrently
+        pageid2tags = page_tag_cache.get_many(data)
+        stale_pages = [page for page in data if page['id'] not in pageid2tags]
+
+        if stale_pages:
+            fetched_tags = run_async(gather_page_tags(context.progress, [page['id'] for page in stale_pages]))
+            page_tag_cache.set_many(stale_pages, fetched_tags)
+            if any(formatted_string is None for formatted_string in fetched_tags.values()):
+                context.incomplete = True
+            for page_id, formatted_string in fetched_tags.items():
+                pageid2tags[page_id] = formatted_string if formatted_string is not None else "No Tag(s)"
         else:
-            data = [data]  
-
-        # Setup of Variables
-        page_ids = [item['id'] for item in data]
-        pageid2tags ={}
-
-        progress['p6'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(page_ids))
-        i = 0
-
-        for page_id in page_ids:
-            page_data = api_request(f'pages/{page_id}')
-
-            if page_data and 'tags' in page_data and page_data['tags']:
-                formatted_string = ", ".join(tag['name'] for tag in page_data['tags'])
-                pageid2tags[page_id] = formatted_string
-            else:
-                pageid2tags[page_id] = "No Tag(s)"
-
-            i += i_count
-            progress['p6'] = i
-
-        progress['p7'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for page in data:
-            # Setting up url columns
-            shelves_name_url = ''
-            shelfid_arr = bookid_shelfid_dict.get(page['book_id'])
-            if shelfid_arr:
-                for shelf_id in shelfid_arr:
-                    shelves_name_url += f'{shelfid_name_dict.get(shelf_id)}: ' + f'https://bookstack.library.com/shelves/{shelfid_slugname_dict.get(shelf_id)}, '
-                
-                shelves_name_url = shelves_name_url[:-2] 
-            else:
-                shelves_name_url += 'No shelves found'
-    
-            shelves_arr.append(shelves_name_url)
-
-            book_slug = bookid_slugname_dict.get(page['book_id'])
-            book_name = bookid_name_dict.get(page['book_id'])
-            if book_slug is not None and book_name is not None:
-                book_slug_arr.append(f'=HYPERLINK("https://bookstack.library.com/books/{book_slug}")')
-                book_name_arr.append(book_name)
-            else:
-                book_slug_arr.append("No Book")
-                book_name_arr.append("No Book")
-
-            chapter_slug = chapterid_slugname_dict.get(page['chapter_id'])
-            chapter_name = chapterid_name_dict.get(page['chapter_id'])
-            if chapter_slug is not None and chapter_name is not None:
-                chapter_slug_arr.append(f'=HYPERLINK("https://bookstack.library.com/books/{bookid_slugname_dict.get(page['book_id'])}/chapter/{chapter_slug}")')
-                chapter_name_arr.append(chapter_name)
-            else:
-                chapter_slug_arr.append("No Chapter")
-                chapter_name_arr.append("No Chapter")
-
-            # Formatting Tags Column
-            formatted_tags_arr.append(pageid2tags[page['id']])
-
-            # Reformats existing property "slug" into a link
-            page['slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{bookid_slugname_dict.get(page['book_id'])}/page/{page['slug']}")'
-
-            # Creating owner name columns        
-            owner_id = bookid_ownerid_dict.get(page['book_id'])
-            book_owner = userid_owner_dict.get(owner_id)
-            if book_owner is None: 
-                book_owner = 'Book Owner Unknown'
-            book_owner_arr.append(book_owner)
-
-            owner_id = chapterid_ownerid_dict.get(page['chapter_id'])
-            chapter_owner = userid_owner_dict.get(owner_id)
-            if chapter_owner is None: 
-                chapter_owner = 'Chapter Owner Unknown'
-            chapter_owner_arr.append(chapter_owner)
-
-            page_owner = userid_owner_dict.get(page['owned_by'])
-            if page_owner is None: 
-                page_owner = 'Page Owner Unknown'
-            page_owner_arr.append(page_owner)
-
-            page_creator = userid_owner_dict.get(page['created_by'])
-            if page_creator is None: 
-                page_creator = 'Page Creator Unknown'
-            page_creator_arr.append(page_creator)
-
-            page_updater = userid_owner_dict.get(page['updated_by'])
-            if page_updater is None: 
-                page_updater = 'Page Updater Unknown'
-            page_updater_arr.append(page_updater)
-
-            # Creating owner email columns
-            owner_id = bookid_ownerid_dict.get(page['book_id'])
-            book_owner_email = userid_email_dict.get(owner_id)
-            if book_owner_email is None: 
-                book_owner_email = 'Book Owner Email Unknown'
-            book_owneremail_arr.append(book_owner_email)
-
-            owner_id = chapterid_ownerid_dict.get(page['chapter_id'])
-            chapter_owner_email = userid_email_dict.get(owner_id)
-            if chapter_owner_email is None: 
-                chapter_owner_email = 'Chapter Owner Email Unknown'
-            chapter_owneremail_arr.append(chapter_owner_email)
-
-            page_owner_email = userid_email_dict.get(page['owned_by'])
-            if page_owner_email is None: 
-                page_owner_email = 'Page Owner Email Unknown'
-            page_owneremail_arr.append(page_owner_email)
-
-            page_creator_email = userid_email_dict.get(page['created_by'])
-            if page_creator_email is None: 
-                page_creator_email = 'Page Creator Email Unknown'
-            page_creatoremail_arr.append(page_creator_email)
-
-            page_updater_email = userid_email_dict.get(page['updated_by'])
-            if page_updater_email is None: 
-                page_updater_email = 'Page Updater Email Unknown'
-            page_updateremail_arr.append(page_updater_email)
-
-            # Fixing the times to be more human-readable
-            dt = datetime.strptime(page['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            page['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            dt = datetime.strptime(page['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            page['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            i += i_count
-            progress['p7'] = i
+            context.progress['p6'] = PROGRESS_BAR_MAX
     else:
-        print("Formatted Pages Report Error")
-        exit()
+        raise ReportError("The Pages report could not gather the library data.")
         
+    context.progress['p7'] = 0
     df = pd.json_normalize(data)
-    df['chapter_slug'] = chapter_slug_arr
-    df['book_slug'] = book_slug_arr
-    df['Chapter Name'] = chapter_name_arr
-    df['Book Name'] = book_name_arr
-    df['Shelves'] = shelves_arr
-    df['tags'] = formatted_tags_arr
-    df['page_owner'] = page_owner_arr
-    df['Page Creator'] = page_creator_arr
-    df['Page Updater'] = page_updater_arr
-    df['chapter_owner'] = chapter_owner_arr
-    df['book_owner'] = book_owner_arr
-    df['Page Owner Email'] = page_owneremail_arr
-    df['Page Creator Email'] = page_creatoremail_arr
-    df['Page Updater Email'] = page_updateremail_arr
-    df['Chapter Owner Email'] = chapter_owneremail_arr
-    df['Book Owner Email'] = book_owneremail_arr
-
+    df = normalize_timestamps(df, ['created_at', 'updated_at'])
+
+    # Setting up url columns, pages without a known book or chapter are marked as such
+    books = context.entities['books']
+    chapters = context.entities['chapters']
+    book_slugs = books.gather(df['book_id'], 'slug')
+    book_names = books.gather(df['book_id'], 'name')
+    has_book = book_slugs.notna() & book_names.notna()
+    df['book_slug'] = hyperlink(library_urls('books', book_slugs.astype(str))).where(has_book, "No Book")
+    df['Book Name'] = book_names.where(has_book, "No Book")
+
+    chapter_slugs = chapters.gather(df['chapter_id'], 'slug')
+    chapter_names = chapters.gather(df['chapter_id'], 'name')
+    has_chapter = chapter_slugs.notna() & chapter_names.notna()
+    df['chapter_slug'] = hyperlink(library_urls('books', book_slugs.astype(str), 'chapter', chapter_slugs.astype(str))).where(has_chapter, "No Chapter")
+    df['Chapter Name'] = chapter_names.where(has_chapter, "No Chapter")
+
+    # Reformats existing column "slug" into a link
+    df['slug'] = hyperlink(library_urls('books', book_slugs.astype(str), 'page', df['slug']))
+
+    df = attach_shelves_column(context, df, 'book_id')
+    df['tags'] = df['id'].map(pageid2tags)
+    context.progress['p7'] = PROGRESS_BAR_MAX
+
+    # Creating owner name and email columns, the book and chapter owners are found through the page's book and chapter
+    df['book_owned_by'] = books.gather(df['book_id'], 'owned_by')
+    df['chapter_owned_by'] = chapters.gather(df['chapter_id'], 'owned_by')
+    df = attach_user_columns(context, df, {
+        'owned_by': ('page_owner', 'Page Owner Email', 'Page Owner Unknown', 'Page Owner Email Unknown'),
+        'created_by': ('Page Creator', 'Page Creator Email', 'Page Creator Unknown', 'Page Creator Email Unknown'),
+        'updated_by': ('Page Updater', 'Page Updater Email', 'Page Updater Unknown', 'Page Updater Email Unknown'),
+        'chapter_owned_by': ('chapter_owner', 'Chapter Owner Email', 'Chapter Owner Unknown', 'Chapter Owner Email Unknown'),
+        'book_owned_by': ('book_owner', 'Book Owner Email', 'Book Owner Unknown', 'Book Owner Email Unknown'),
+    })
     
     # Restructuring/renaming of the dataframe
     reorder = ['name', 'slug', 'page_owner', 'Page Owner Email', 'Page Creator', 'Page Creator Email', 'Page Updater', 'Page Updater Email','draft', 'created_at', 'updated_at', 'tags', 'Chapter Name', 'chapter_slug', 'chapter_owner', 'Chapter Owner Email', 'Book Name', 'book_slug', 'book_owner', 'Book Owner Email', 'Shelves', 'id', 'book_id', 'chapter_id', 'template', 'priority', 'owned_by', 'created_by', 'updated_by', 'revision_count', 'editor']
@@ -551,103 +1324,44 @@ def formatted_pages_report():
 
     return df
     
-def attachments_report():
+def attachments_report(context):
     """
     Generates a detailed report on attachments, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all attachments data from the API in batches.
+    1. Gets all attachments data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for attachments
     3. Formats tags and other attributes for readability.
     4. Transposes the collected data into a pandas DataFrame.
     5. Reorders and renames columns for clarity and drops unnecessary columns.
     """
-    setup_res = api_request('attachments', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('attachments', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'attachments?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('attachments')
     
-    if data:
-        # Variable setup
-        total = data['total']
-        creator_arr, creator_email_arr, updater_arr, updater_email_arr, page_name_arr = [], [], [], [], []
+    if data is not None:
+        context.progress['p8'] = 0
 
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data'] 
+        # Creation of the dataframe, a library without attachments gets an empty sheet
+        if data:
+            df = pd.json_normalize(data)
         else:
-            data = [data] 
-
-        progress['p8'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for atc in data:
-            # Adding Names and Emails of Creators and Updaters
-            creator = userid_owner_dict.get(atc['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-            creator_email = userid_email_dict.get(atc['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-            updater = userid_owner_dict.get(atc['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-            updater_email = userid_email_dict.get(atc['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(atc['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            atc['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(atc['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            atc['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Matching Pages to Names
-            page_name = pageid_name_dict.get(atc['uploaded_to'])
-            if page_name:
-                page_name_arr.append(page_name)
-            else:
-                page_name_arr.append("No Page Found")
-
-            # Matching Pages to Ids
-            page_slug = pageid_slug_dict.get(atc['uploaded_to'])
-            book_id = pageid_bookid_dict.get(atc['uploaded_to'])
-            if page_slug and book_id:
-                atc['uploaded_to'] = f'=HYPERLINK("https://bookstack.library.com/books/{bookid_slugname_dict.get(book_id)}/page/{page_slug}")'
-            else:
-                atc['uploaded_to'] = "No Page Found"
-
-            # Formatting external true and false to yes and no
-            if atc['external'] == True:
-                atc['external'] = 'Yes'
-            elif atc['external'] == False:
-                atc['external'] = 'No'
-
-            i += i_count
-            progress['p8'] = i
-
-        # Creation of the dataframe
-        df = pd.json_normalize(data)
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
-        df['Page Name'] = page_name_arr
+            df = pd.DataFrame(columns=['id', 'name', 'extension', 'uploaded_to', 'external', 'order', 'created_at', 'updated_at', 'created_by', 'updated_by'])
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, {key: OWNER_CREATOR_UPDATER_COLUMNS[key] for key in ('created_by', 'updated_by')})
+
+        # Matching Pages to Names
+        pages = context.entities['pages']
+        df['Page Name'] = pages.gather(df['uploaded_to'], 'name').fillna("No Page Found")
+
+        # Matching Pages to URLs
+        page_slugs = pages.gather(df['uploaded_to'], 'slug')
+        book_ids = pages.gather(df['uploaded_to'], 'book_id')
+        book_slugs = context.entities['books'].gather(book_ids, 'slug').astype(str)
+        has_page = page_slugs.notna() & book_ids.notna()
+        df['uploaded_to'] = hyperlink(library_urls('books', book_slugs, 'page', page_slugs.astype(str))).where(has_page, "No Page Found")
+
+        # Formatting external true and false to yes and no
+        df['external'] = df['external'].map({True: 'Yes', False: 'No'})
+        context.progress['p8'] = PROGRESS_BAR_MAX
         
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'order', 'created_by', 'updated_by'], axis=1)
@@ -661,120 +1375,35 @@ def attachments_report():
         
         return df 
     else:
-        print("Attachments Report Failed")
-        exit()
+        raise ReportError("The Attachments report could not gather the library data.")
 
-def books_report():
+def books_report(context):
     """
     Generates a detailed report on books, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all books data from the API in batches.
+    1. Gets all books data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for books and shelves
     3. Formats tags and other attributes for readability.
     4. Transposes the collected data into a pandas DataFrame.
     5. Reorders and renames columns for clarity and drops unnecessary columns.
     """
 
-    setup_res = api_request('books', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('books', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'books?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('books')
 
     if data:
-        # Variable setup
-        total = data['total']
-        owner_arr, owner_email_arr, creator_arr, creator_email_arr, updater_arr, updater_email_arr, shelves_arr = [], [], [], [], [], [], []
-
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']  
-        else:
-            data = [data] 
-
-        progress['p9'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for book in data:
-            # Adding Names and Emails of Creators and Updaters
-            owner = userid_owner_dict.get(book['owned_by'])
-            if owner is None: 
-                owner = 'No Owner Found'
-            owner_arr.append(owner)
-
-            owner_email = userid_email_dict.get(book['owned_by'])
-            if owner_email is None:
-                owner_email = 'No Owner Email Found'
-            owner_email_arr.append(owner_email)
-
-            creator = userid_owner_dict.get(book['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-
-            creator_email = userid_email_dict.get(book['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-
-            updater = userid_owner_dict.get(book['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-
-            updater_email = userid_email_dict.get(book['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(book['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            book['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(book['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            book['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Matching Pages to Ids
-            book['slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{book['slug']}")' # May be wrong
-
-            # Setup for Shelves Column
-            shelves_name_url = ''
-            shelfid_arr = bookid_shelfid_dict.get(book['id'])
-            if shelfid_arr:
-                for shelf_id in shelfid_arr:
-                    shelves_name_url += f'{shelfid_name_dict.get(shelf_id)}: ' + f'https://bookstack.library.com/shelves/{shelfid_slugname_dict.get(shelf_id)}, '
-                
-                shelves_name_url = shelves_name_url[:-2] 
-            else:
-                shelves_name_url += 'No shelves found'
-    
-            shelves_arr.append(shelves_name_url)
-
-            # Fixing Descriptions:
-            if book['description'] == '':
-                book['description'] = "No Description"
-            i += i_count
-            progress['p9'] = i
+        context.progress['p9'] = 0
 
         # Creation of the dataframe
         df = pd.json_normalize(data)
-        df['Owner'] = owner_arr
-        df['Owner Email'] = owner_email_arr
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
-        df['Shelves'] = shelves_arr
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, OWNER_CREATOR_UPDATER_COLUMNS)
+        df = attach_shelves_column(context, df)
+
+        # Formatting the urls and descriptions of each book
+        df['slug'] = hyperlink(library_urls('books', df['slug']))
+        df['description'] = df['description'].replace('', "No Description")
+        context.progress['p9'] = PROGRESS_BAR_MAX
         
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'owned_by', 'created_by', 'updated_by'], axis=1)
@@ -788,130 +1417,44 @@ def books_report():
 
         return df
     else:
-        print('Books Report Failed')
-        exit()
+        raise ReportError("The Books report could not gather the library data.")
 
-def duplicate_books_report():
+def duplicate_books_report(context):
     """
     Generates a detailed report on duplicate books, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all books data from the API in batches.
+    1. Gets all books data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for books and shelves
     3. Formats tags and other attributes for readability.
-    4. Filters dataframe to only show duplicate items.
-    5. Sorts dataframe by name for readability.
+    4. Filters dataframe to only show duplicate items, including names that only differ in case, accents, punctuation or spacing, or are similar enough.
+    5. Sorts dataframe by duplicate group and name for readability.
     6. Transposes the collected data into a pandas DataFrame.
     7. Reorders and renames columns for clarity and drops unnecessary columns.
     """
 
-    setup_res = api_request('books', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('books', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'books?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('books')
 
     if data:
-        # Variable setup
-        total = data['total']
-        owner_arr, owner_email_arr, creator_arr, creator_email_arr, updater_arr, updater_email_arr, shelves_arr = [], [], [], [], [], [], []
-
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']  
-        else:
-            data = [data]  
-        
-        # Creating the owner creator and updater arrs to add to the end of the dataframe
-        progress['p10'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for book in data:
-            # Adding Names and Emails of Creators and Updaters
-            owner = userid_owner_dict.get(book['owned_by'])
-            if owner is None: 
-                owner = 'No Owner Found'
-            owner_arr.append(owner)
-
-            owner_email = userid_email_dict.get(book['owned_by'])
-            if owner_email is None:
-                owner_email = 'No Owner Email Found'
-            owner_email_arr.append(owner_email)
-
-            creator = userid_owner_dict.get(book['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-
-            creator_email = userid_email_dict.get(book['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-
-            updater = userid_owner_dict.get(book['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-            
-            updater_email = userid_email_dict.get(book['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(book['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            book['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(book['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            book['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Matching Pages to Ids
-            book['slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{book['slug']}")' # May be wrong
-
-            # Setup for Shelves Column
-            shelves_name_url = ''
-            shelfid_arr = bookid_shelfid_dict.get(book['id'])
-            if shelfid_arr:
-                for shelf_id in shelfid_arr:
-                    shelves_name_url += f'{shelfid_name_dict.get(shelf_id)}: ' + f'https://bookstack.library.com/shelves/{shelfid_slugname_dict.get(shelf_id)}, '
-                
-                shelves_name_url = shelves_name_url[:-2] 
-            else:
-                shelves_name_url += 'No shelves found'
-    
-            shelves_arr.append(shelves_name_url)
-
-            # Fixing Descriptions:
-            if book['description'] == '':
-                book['description'] = "No Description"
-            i += i_count
-            progress['p10'] = i
+        context.progress['p10'] = 0
 
+        # Keeping only the duplicate books before formatting them
         df = pd.json_normalize(data)
-        df['Owner'] = owner_arr
-        df['Owner Email'] = owner_email_arr
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
-        df['Shelves'] = shelves_arr
-        df = df[df.duplicated('name', keep=False)]
-        df = df.sort_values(by='name')
+        df = attach_duplicate_columns(df)
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, OWNER_CREATOR_UPDATER_COLUMNS)
+        df = attach_shelves_column(context, df)
+
+        # Formatting the urls and descriptions of each book
+        df['slug'] = hyperlink(library_urls('books', df['slug']))
+        df['description'] = df['description'].replace('', "No Description")
+        context.progress['p10'] = PROGRESS_BAR_MAX
 
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'owned_by', 'created_by', 'updated_by'], axis=1)
 
         # Restructuring of the dataframe
-        reorder = ['name', 'slug', 'description', 'Owner', 'Owner Email', 'Creator', 'Creator Email', 'created_at', 'Updater', 'Updater Email', 'updated_at', 'Shelves']
+        reorder = ['Duplicate Group', 'Similarity', 'name', 'slug', 'description', 'Owner', 'Owner Email', 'Creator', 'Creator Email', 'created_at', 'Updater', 'Updater Email', 'updated_at', 'Shelves']
         df = df[reorder]
 
         # Renaming of the dataframe
@@ -919,144 +1462,44 @@ def duplicate_books_report():
 
         return df
     else:
-        print("Duplicate Books Report Failed")
-        exit()
+        raise ReportError("The Duplicate Books report could not gather the library data.")
 
-def unshelved_books_report():
+def unshelved_books_report(context):
     """
     Generates a detailed report on unshelved books, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all books data from the API in batches.
+    1. Gets all books data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for books and shelves
     3. Formats tags and other attributes for readability.
-    4. Iterates through list of all shelves, then iterates through each book on each shelf.
-    5. If a book is found on a shelf, it is then removed from the list of books.
-    6. Transposes the collected data into a pandas DataFrame.
-    7. Reorders and renames columns for clarity and drops unnecessary columns.
+    4. Removes every book found on a shelf in the shelf index of the snapshot, in one pass over the books.
+    5. Transposes the collected data into a pandas DataFrame.
+    6. Reorders and renames columns for clarity and drops unnecessary columns.
     """
  
-    setup_res = api_request('books', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('books', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'books?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('books')
 
     if data:
-        # Variable setup
-        total = data['total']
-        owner_arr, owner_email_arr, creator_arr, creator_email_arr, updater_arr, updater_email_arr, shelves_arr = [], [], [], [], [], [], []
+        df = pd.json_normalize(data)
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, OWNER_CREATOR_UPDATER_COLUMNS)
 
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']  
-        else:
-            data = [data]  
-
-        # Creating the owner creator and updater arrs to add to the end of the dataframe
-        for book in data:
-            # Adding Names and Emails of Creators and Updaters
-            owner = userid_owner_dict.get(book['owned_by'])
-            if owner is None: 
-                owner = 'No Owner Found'
-            owner_arr.append(owner)
-
-            owner_email = userid_email_dict.get(book['owned_by'])
-            if owner_email is None:
-                owner_email = 'No Owner Email Found'
-            owner_email_arr.append(owner_email)
-
-            creator = userid_owner_dict.get(book['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-
-            creator_email = userid_email_dict.get(book['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-
-            updater = userid_owner_dict.get(book['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-            
-            updater_email = userid_email_dict.get(book['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(book['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            book['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(book['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            book['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Matching Pages to Ids
-            book['slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{book['slug']}")' # May be wrong
-
-            # Setup for Shelves Column
-            shelves_name_url = ''
-            shelfid_arr = bookid_shelfid_dict.get(book['id'])
-            if shelfid_arr:
-                for shelf_id in shelfid_arr:
-                    shelves_name_url += f'{shelfid_name_dict.get(shelf_id)}: ' + f'https://bookstack.library.com/shelves/{shelfid_slugname_dict.get(shelf_id)}, '
-                
-                shelves_name_url = shelves_name_url[:-2] 
-            else:
-                shelves_name_url += 'No shelves found'
-    
-            shelves_arr.append(shelves_name_url)
+        # Formatting the urls and descriptions of each book
+        df['slug'] = hyperlink(library_urls('books', df['slug']))
+        df['description'] = df['description'].replace('', "No Description")
+    else:
+        raise ReportError("The Unshelved Books report could not gather the library data.")
 
-            # Fixing Descriptions:
-            if book['description'] == '':
-                book['description'] = "No Description"
+    # Getting the books on each shelf from the shelf index of the snapshot
+    shelf_index = context.snapshot.shelf_index()
 
-        df = pd.json_normalize(data)
-        df['Owner'] = owner_arr
-        df['Owner Email'] = owner_email_arr
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
-    else:
-        return
+    if shelf_index:
+        context.progress['p11'] = 0
 
-    # Sending request for all shelves
-    data = api_request('shelves', 300)
+        # Keeping only the books that are not on any shelf
+        df = df[~df['id'].isin(shelf_index.book_shelves.keys())]
+        context.progress['p11'] = PROGRESS_BAR_MAX
 
-    if data:
-        if 'data' in data:
-            data = data['data']  # In case of listing shelves
-        else:
-            data = [data]  # In case of a single shelf
-
-        shelf_ids = [item['id'] for item in data]
-
-        progress['p11'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(shelf_ids))
-        i = 0
-        for id in shelf_ids:
-            # Sending request for specific shelf
-            data = api_request(f'shelves/{id}', 300)
-            shelf_books = data['books']
-            book_ids = [item['id'] for item in shelf_books]
-            for book_id in book_ids:
-                df = df[df['id'] != book_id]
-            
-            i += i_count
-            progress['p11'] = i
-        
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'owned_by', 'created_by', 'updated_by'], axis=1)
 
@@ -1069,115 +1512,36 @@ def unshelved_books_report():
 
         return df
     else:
-        print("Unshelved Books Report Failed")
-        exit()
+        raise ReportError("The Unshelved Books report could not gather the library data.")
 
-def chapters_report():
+def chapters_report(context):
     """
     Generates a detailed report on chapters, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all chapters data from the API in batches.
+    1. Gets all chapters data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for chapters, books and shelves
     3. Formats tags and other attributes for readability.
     4. Transposes the collected data into a pandas DataFrame.
     5. Reorders and renames columns for clarity and drops unnecessary columns.
     """
     
-    setup_res = api_request('chapters', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('chapters', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'chapters?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('chapters')
 
     if data:
-        # Variable Setup
-        total = data['total']
-        owner_arr, owner_email_arr, creator_arr, creator_email_arr, updater_arr, updater_email_arr, book_name_arr = [], [], [], [], [], [], []
-
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']  
-        else:
-            data = [data] 
-
-        progress['p12'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for chapter in data:
-            # Adding Names and Emails of Creators and Updaters
-            owner = userid_owner_dict.get(chapter['owned_by'])
-            if owner is None: 
-                owner = 'No Owner Found'
-            owner_arr.append(owner)
-
-            owner_email = userid_email_dict.get(chapter['owned_by'])
-            if owner_email is None:
-                owner_email = 'No Owner Email Found'
-            owner_email_arr.append(owner_email)
-
-            creator = userid_owner_dict.get(chapter['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-
-            creator_email = userid_email_dict.get(chapter['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-
-            updater = userid_owner_dict.get(chapter['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-            
-            updater_email = userid_email_dict.get(chapter['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(chapter['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            chapter['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(chapter['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            chapter['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Fixing Chapter URL
-            chapter['slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{chapter['book_slug']}/chapter/{chapter['slug']}")' # May be wrong
-
-            # Formatting Book name Column
-            curr_bookname = bookid_name_dict.get(chapter['book_id'])
-            book_name_arr.append(curr_bookname)
-
-            # Fixing Book URL
-            chapter['book_slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{chapter['book_slug']}/")' # May be wrong
-
-            # Fixing Descriptions:
-            if chapter['description'] == '':
-                chapter['description'] = "No Description"
-
-            i += i_count
-            progress['p12'] = i
+        context.progress['p12'] = 0
 
         # Creation of the dataframe
         df = pd.json_normalize(data)
-        df['Owner'] = owner_arr
-        df['Owner Email'] = owner_email_arr
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
-        df['Book Name'] = book_name_arr
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, OWNER_CREATOR_UPDATER_COLUMNS)
+
+        # Formatting the urls, book names and descriptions of each chapter
+        df['slug'] = hyperlink(library_urls('books', df['book_slug'], 'chapter', df['slug']))
+        df['book_slug'] = hyperlink(library_urls('books', df['book_slug'], ''))
+        df['Book Name'] = context.entities['books'].gather(df['book_id'], 'name')
+        df['description'] = df['description'].replace('', "No Description")
+        context.progress['p12'] = PROGRESS_BAR_MAX
         
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'priority', 'book_id', 'owned_by', 'created_by', 'updated_by'], axis=1)
@@ -1191,118 +1555,44 @@ def chapters_report():
 
         return df
     else:
-        print("Chapters Report Failed")
-        exit()
+        raise ReportError("The Chapters report could not gather the library data.")
 
-def duplicate_pages_report():
+def duplicate_pages_report(context):
     """
     Generates a detailed report on duplicate pages, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all pages data from the API in batches.
+    1. Gets all pages data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for pages, chapters, books and shelves
     3. Formats tags and other attributes for readability.
-    4. Filters dataframe to only show duplicate items.
-    5. Sorts dataframe by name for readability.
+    4. Filters dataframe to only show duplicate items, including names that only differ in case, accents, punctuation or spacing, or are similar enough.
+    5. Sorts dataframe by duplicate group and name for readability.
     6. Transposes the collected data into a pandas DataFrame.
     7. Reorders and renames columns for clarity and drops unnecessary columns.
     """
 
-    setup_res = api_request('pages', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('pages', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'pages?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('pages')
 
     if data:
-        # Variable setup
-        total = data['total']
-        owner_arr, owner_email_arr, creator_arr, creator_email_arr, updater_arr, updater_email_arr, book_name_arr = [], [], [], [], [], [], []
-
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']  
-        else:
-            data = [data]  
-
-        progress['p13'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for page in data:
-           # Adding Names and Emails of Creators and Updaters
-            owner = userid_owner_dict.get(page['owned_by'])
-            if owner is None: 
-                owner = 'No Owner Found'
-            owner_arr.append(owner)
-
-            owner_email = userid_email_dict.get(page['owned_by'])
-            if owner_email is None:
-                owner_email = 'No Owner Email Found'
-            owner_email_arr.append(owner_email)
-
-            creator = userid_owner_dict.get(page['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-
-            creator_email = userid_email_dict.get(page['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-
-            updater = userid_owner_dict.get(page['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-            
-            updater_email = userid_email_dict.get(page['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(page['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            page['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(page['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            page['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Matching Pages to Ids
-            page['slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{page['book_slug']}/page/{page['slug']}")' 
-            page['book_slug'] = f'=HYPERLINK("https://bookstack.library.com/books/{page['book_slug']}")'
-
-            # Creating Book Name Column
-            book_name = bookid_name_dict.get(page['book_id'])
-            book_name_arr.append(book_name)
-
-            i += i_count
-            progress['p13'] = i
+        context.progress['p13'] = 0
 
+        # Keeping only the duplicate pages before formatting them
         df = pd.json_normalize(data)
-        df['Owner'] = owner_arr
-        df['Owner Email'] = owner_email_arr
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
-        df['Book Name'] = book_name_arr
-        df = df[df.duplicated('name', keep=False)]
-        df = df.sort_values(by='name')
+        df = attach_duplicate_columns(df)
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, OWNER_CREATOR_UPDATER_COLUMNS)
+
+        # Formatting the urls and book names of each page
+        df['slug'] = hyperlink(library_urls('books', df['book_slug'], 'page', df['slug']))
+        df['book_slug'] = hyperlink(library_urls('books', df['book_slug']))
+        df['Book Name'] = context.entities['books'].gather(df['book_id'], 'name')
+        context.progress['p13'] = PROGRESS_BAR_MAX
 
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'book_id', 'chapter_id', 'draft', 'template', 'priority', 'owned_by', 'created_by', 'updated_by', 'editor'], axis=1)
 
         # Restructuring of the dataframe
-        reorder = ['name', 'slug', 'Owner', 'Owner Email', 'Creator', 'Creator Email', 'created_at', 'Updater', 'Updater Email', 'updated_at' , 'revision_count', 'Book Name', 'book_slug']
+        reorder = ['Duplicate Group', 'Similarity', 'name', 'slug', 'Owner', 'Owner Email', 'Creator', 'Creator Email', 'created_at', 'Updater', 'Updater Email', 'updated_at' , 'revision_count', 'Book Name', 'book_slug']
         df = df[reorder]
 
         # Renaming of the dataframe
@@ -1310,106 +1600,34 @@ def duplicate_pages_report():
         
         return df
     else:
-        print('Duplicate Pages Report Failed')
-        exit()
+        raise ReportError("The Duplicate Pages report could not gather the library data.")
 
-def shelves_report():
+def shelves_report(context):
     """
     Generates a detailed report on shelves, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all shelves data from the API in batches.
+    1. Gets all shelves data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (names, emails) for shelves
     3. Formats tags and other attributes for readability.
     4. Transposes the collected data into a pandas DataFrame.
     5. Reorders and renames columns for clarity and drops unnecessary columns.
     """
 
-    setup_res = api_request('shelves', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('shelves', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'shelves?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('shelves')
 
     if data:
-        # Variable setup
-        total = data['total']
-        owner_arr, owner_email_arr, creator_arr, creator_email_arr, updater_arr, updater_email_arr = [], [], [], [], [], []
+        context.progress['p14'] = 0
 
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']
-        else:
-            data = [data]
-
-        progress['p14'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for shelf in data:
-            # Adding Names and Emails of Creators and Updaters
-            owner = userid_owner_dict.get(shelf['owned_by'])
-            if owner is None: 
-                owner = 'No Owner Found'
-            owner_arr.append(owner)
-
-            owner_email = userid_email_dict.get(shelf['owned_by'])
-            if owner_email is None:
-                owner_email = 'No Owner Email Found'
-            owner_email_arr.append(owner_email)
-
-            creator = userid_owner_dict.get(shelf['created_by'])
-            if creator is None:
-                creator = "No Creator Found"
-            creator_arr.append(creator)
-
-            creator_email = userid_email_dict.get(shelf['created_by'])
-            if creator_email is None:
-                creator_email = "No Creator Email Found"
-            creator_email_arr.append(creator_email)
-
-            updater = userid_owner_dict.get(shelf['updated_by'])
-            if updater is None:
-                updater = 'No Updater Found'
-            updater_arr.append(updater)
-            
-            updater_email = userid_email_dict.get(shelf['updated_by'])
-            if updater_email is None:
-                updater_email = 'No Updater Found'
-            updater_email_arr.append(updater_email)
-
-            # Formatting Times
-            dt = datetime.strptime(shelf['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            shelf['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(shelf['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            shelf['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Matching Pages to Ids
-            shelf['slug'] = f'=HYPERLINK("https://bookstack.library.com/shelves/{shelf['slug']}")' # May be wrong
-
-            # Fixing Descriptions:
-            if shelf['description'] == '':
-                shelf['description'] = "No Description"
-
-            i += i_count
-            progress['p14'] = i
         # Creation of the dataframe
         df = pd.json_normalize(data)
-        df['Owner'] = owner_arr
-        df['Owner Email'] = owner_email_arr
-        df['Creator'] = creator_arr
-        df['Creator Email'] = creator_email_arr
-        df['Updater'] = updater_arr
-        df['Updater Email'] = updater_email_arr
+        df = normalize_timestamps(df, ['created_at', 'updated_at'])
+        df = attach_user_columns(context, df, OWNER_CREATOR_UPDATER_COLUMNS)
+
+        # Formatting the urls and descriptions of each shelf
+        df['slug'] = hyperlink(library_urls('shelves', df['slug']))
+        df['description'] = df['description'].replace('', "No Description")
+        context.progress['p14'] = PROGRESS_BAR_MAX
         
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'owned_by', 'created_by', 'updated_by'], axis=1)
@@ -1423,72 +1641,33 @@ def shelves_report():
 
         return df
     else:
-        print('Shelves Report Failed')
-        exit()
+        raise ReportError("The Shelves report could not gather the library data.")
 
-def users_report():
+def users_report(context):
     """
     Generates a detailed report on users, fetching data from an API and formatting it into a pandas DataFrame.
 
     This function performs the following steps:
-    1. Fetches all users data from the API in batches.
+    1. Gets all users data from the snapshot of the current run.
     2. Constructs URLs and gathers detailed information (Creation Date, Last Activity, ...) for users
     3. Formats tags and other attributes for readability.
     4. Transposes the collected data into a pandas DataFrame.
     5. Reorders and renames columns for clarity and drops unnecessary columns.
     """
 
-    setup_res = api_request('users', 1)
-    setup_total = setup_res['total']
-    initial_response = api_request('users', MAX_ROWS_PER_FETCH)
-    data = {
-        "data": initial_response['data'],
-        "total": initial_response['total']
-    }
-    setup_total -= MAX_ROWS_PER_FETCH
-
-    offset = MAX_ROWS_PER_FETCH
-    while setup_total > 0:
-        additional_response = api_request(f'users?offset={offset}', MAX_ROWS_PER_FETCH)
-        data['data'] = data['data'] + additional_response['data']
-        setup_total -= MAX_ROWS_PER_FETCH
-        offset += MAX_ROWS_PER_FETCH
+    data = context.snapshot.rows('users')
 
     if data:
-        # Variable setup
-        total = data['total']
-
-        # Restructures json to return just a list rather than a list and the total number of records
-        if 'data' in data:
-            data = data['data']
-        else:
-            data = [data]
-
-        progress['p15'] = 0
-        i_count = (PROGRESS_BAR_MAX / len(data))
-        i = 0
-        for user in data:
-            # Formatting Times
-            if user['last_activity_at'] is None:
-                user['last_activity_at'] = 'Unknown'
-            else:
-                dt = datetime.strptime(user['last_activity_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-                user['last_activity_at'] =  dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(user['created_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            user['created_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-            dt = datetime.strptime(user['updated_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
-            user['updated_at'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Formatting Profile URLS
-            user['profile_url'] = f'=HYPERLINK("{user['profile_url']}")'
-            user['edit_url'] = f'=HYPERLINK("{user['edit_url']}")'
-            user['avatar_url'] = f'=HYPERLINK("{user['avatar_url']}")'
-
-            i += i_count
-            progress['p15'] = i
+        context.progress['p15'] = 0
 
         # Creation of the dataframe
         df = pd.json_normalize(data)
+        df = normalize_timestamps(df, ['created_at', 'updated_at', 'last_activity_at'])
+
+        # Formatting Profile URLS
+        for column in ['profile_url', 'edit_url', 'avatar_url']:
+            df[column] = hyperlink(df[column])
+        context.progress['p15'] = PROGRESS_BAR_MAX
 
         # Dropping Unneccesary Columns
         df = df.drop(['id', 'external_auth_id', 'slug'], axis=1)
@@ -1502,8 +1681,198 @@ def users_report():
 
         return df
     else:
-        print('Users Report Failed')
-        exit()
+        raise ReportError("The Users report could not gather the library data.")
+
+# Every report with the name of its sheet, the function building it, what it needs from the library: the list endpoints
+# its records come from ('shelf_index' for the details of every shelf), each with the entity store built from it,
+# and its progress bars.
+# The reports are written in the order of their sheets.
+REPORTS = {
+    'pages': {'sheet': "Pages", 'build': formatted_pages_report, 'needs': {'pages', 'books', 'chapters', 'shelves', 'shelf_index', 'users'}, 'progress': ['p6', 'p7']},
+    'attachments': {'sheet': "Attachments", 'build': attachments_report, 'needs': {'attachments', 'pages', 'books', 'users'}, 'progress': ['p8']},
+    'chapters': {'sheet': "Chapters", 'build': chapters_report, 'needs': {'chapters', 'books', 'users'}, 'progress': ['p12']},
+    'books': {'sheet': "Books", 'build': books_report, 'needs': {'books', 'shelves', 'shelf_index', 'users'}, 'progress': ['p9']},
+    'shelves': {'sheet': "Shelves", 'build': shelves_report, 'needs': {'shelves', 'users'}, 'progress': ['p14']},
+    'users': {'sheet': "Users", 'build': users_report, 'needs': {'users'}, 'progress': ['p15']},
+    'duplicate_books': {'sheet': "Duplicate Books", 'build': duplicate_books_report, 'needs': {'books', 'shelves', 'shelf_index', 'users'}, 'progress': ['p10']},
+    'unshelved_books': {'sheet': "Unshelved Books", 'build': unshelved_books_report, 'needs': {'books', 'shelves', 'shelf_index', 'users'}, 'progress': ['p11']},
+    'duplicate_pages': {'sheet': "Duplicate Pages", 'build': duplicate_pages_report, 'needs': {'pages', 'books', 'users'}, 'progress': ['p13']},
+}
+
+def plan_run(reports):
+    """
+    Returns what the library has to provide for the given reports: the union of their needs in REPORTS.
+
+    run_setup only fetches and builds the entity stores of these, e.g. the "Unshelved Books" report alone
+    only needs the users, books and shelves.
+    """
+    plan = set()
+    for key in reports:
+        plan |= REPORTS[key]['needs']
+    return plan
+
+class JobRunner:
+    """
+    Runs the setup and report generation in the background, so the requests starting them return at once.
+
+    Every job belongs to a run, whose RunContext holds the state shared by its setup job and the report job that follows it.
+    Jobs are queued and run in the order they were submitted by JOB_WORKERS worker threads, the runs being isolated
+    from each other, several of them can be in progress at the same time. Each job can be followed by its id with `status`.
+
+    The library data of a finished setup job is released once its reports are built, or after `release_timeout` seconds
+    if they are never requested, e.g. because the page was closed.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY, release_timeout=SETUP_RELEASE_TIMEOUT):
+        self.history = history
+        self.release_timeout = release_timeout
+        self.jobs = {}
+        self.runs = {}
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self.work, name=f'job-runner-{i}', daemon=True).start()
+
+    def submit(self, kind, context, fn, *args, **kwargs):
+        # Queues fn(context, *args, **kwargs) as a job of the run of `context` and returns the id of the new job
+        job = {'id': uuid.uuid4().hex, 'kind': kind, 'run_id': context.id, 'state': 'queued', 'queued_at': time.time(),
+               'started_at': None, 'finished_at': None, 'result': None, 'error': None}
+        with self.lock:
+            self.jobs[job['id']] = job
+            self.runs[context.id] = context
+            self.forget_finished()
+        self.queue.put((job, context, fn, args, kwargs))
+        return job['id']
+
+    def context(self, job_id):
+        # Returns the RunContext of the run a job belongs to, or None for an unknown job
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self.runs.get(job['run_id']) if job else None
+
+    def forget_finished(self):
+        # Forgets the oldest finished jobs beyond the history, and the runs that no longer have a job.
+        # Their report files are kept for other runs to reuse, until pruned by prune_report_files.
+        finished = [job_id for job_id, job in self.jobs.items() if job['state'] in ('done', 'failed')]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self.jobs[job_id]
+
+        remaining_runs = {job['run_id'] for job in self.jobs.values()}
+        for run_id in [run_id for run_id in self.runs if run_id not in remaining_runs]:
+            del self.runs[run_id]
+
+    def release_unused(self, context):
+        # Releases the library data of a run whose reports were not requested, called release_timeout seconds after its setup
+        with self.lock:
+            if not any(job['run_id'] == context.id and job['kind'] == 'reports' for job in self.jobs.values()):
+                context.release()
+
+    def work(self):
+        while True:
+            job, context, fn, args, kwargs = self.queue.get()
+            job['started_at'] = time.time()
+            job['state'] = 'running'
+            try:
+                result = fn(context, *args, **kwargs)
+            except Exception as error:
+                # A failed report, e.g. a ReportError when the library data is missing, only ends this job
+                job['error'] = str(error) or type(error).__name__
+                result = False
+            if result is False:
+                job['state'] = 'failed'
+                job['error'] = job['error'] or f'The {job["kind"]} could not gather the library data.'
+                context.release()
+            else:
+                job['state'] = 'done'
+                job['result'] = result if result is not True else None
+                if job['kind'] == 'setup':
+                    timer = threading.Timer(self.release_timeout, self.release_unused, (context,))
+                    timer.daemon = True
+                    timer.start()
+            job['finished_at'] = time.time()
+
+    def status(self, job_id):
+        """
+        Returns the state of a job ('queued', 'running', 'done' or 'failed') with its timings in seconds and the names of
+        the files it produced, or None for an unknown job.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job = dict(job)
+        now = time.time()
+        started_at = job['started_at'] or now
+        job['queue_seconds'] = round(started_at - job['queued_at'], 3)
+        job['run_seconds'] = round((job['finished_at'] or now) - started_at, 3) if job['started_at'] else None
+        for key in ('queued_at', 'started_at', 'finished_at'):
+            if job[key] is not None:
+                job[key] = datetime.fromtimestamp(job[key]).isoformat(timespec='seconds')
+        return job
+
+# Setup and report jobs started from the home page
+job_runner = JobRunner()
+
+class ReportScheduler:
+    """
+    Generates every report in the background at the times of REPORT_SCHEDULE, e.g. at night while the library is quiet,
+    and publishes the files of the latest scheduled run so the home page can offer them right away.
+
+    Each scheduled run is one 'scheduled' job of the job runner running the setup, then the reports. A time is skipped
+    while the previous scheduled run is still queued or running.
+    """
+
+    def __init__(self, schedule=REPORT_SCHEDULE, path=LATEST_REPORT_PATH):
+        self.schedules = [parse_cron(expression) for expression in schedule.split(';') if expression.strip()]
+        self.path = path
+        self.job_id = None
+        if self.schedules:
+            threading.Thread(target=self.run, name='report-scheduler', daemon=True).start()
+
+    def run(self):
+        checked = None
+        while True:
+            # Waking up at the start of every minute, each minute is only checked once
+            time.sleep(60 - time.time() % 60)
+            now = datetime.now().replace(second=0, microsecond=0)
+            if now != checked and any(cron_matches(schedule, now) for schedule in self.schedules):
+                self.start()
+            checked = now
+
+    def start(self):
+        # Queues a scheduled run, unless the previous one is not finished yet, and returns the id of its job
+        status = job_runner.status(self.job_id) if self.job_id else None
+        if status is None or status['state'] not in ('queued', 'running'):
+            self.job_id = job_runner.submit('scheduled', RunContext(), self.generate)
+        return self.job_id
+
+    def generate(self, context):
+        # Runs the setup and the reports of a scheduled run, then publishes its report files
+        if not run_setup(context):
+            return False
+        report_files = run_reports(context)
+        if report_files is False:
+            return False
+        with open(f'{self.path}.part', 'w') as file:
+            json.dump({'files': report_files, 'built_at': time.time()}, file)
+        os.replace(f'{self.path}.part', self.path)
+        return report_files
+
+    def latest(self):
+        # Returns the report files of the latest scheduled run that are still in ./reports with the datetime they were built at,
+        # or None if there are none.
+        try:
+            with open(self.path) as file:
+                latest = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        files = [filename for filename in latest['files'] if os.path.exists(f'./reports/{filename}')]
+        if not files:
+            return
+        return {'files': files, 'built_at': datetime.fromtimestamp(latest['built_at'])}
+
+# Scheduled runs
+report_scheduler = ReportScheduler()
 
 # Flask Application
 app = Flask(__name__)
@@ -1514,8 +1883,12 @@ app.permanent_session_lifetime = timedelta(minutes=5)
 @app.route("/")
 def index():
     if 'username' in session:
-        progress.clear()
-        return render_template('home.html')
+        latest = report_scheduler.latest()
+        if latest:
+            # Showing the date the latest reports were built at, unless it is today
+            built_at = latest['built_at']
+            latest['built'] = built_at.strftime('%H:%M' if built_at.date() == datetime.now().date() else '%Y-%m-%d %H:%M')
+        return render_template('home.html', reports={key: report['sheet'] for key, report in REPORTS.items()}, latest=latest)
     else:
         return redirect('/login')
     
@@ -1543,26 +1916,102 @@ def logout():
     else:
         return redirect('/login')
 
-@app.route('/progress')
-def get_progress():
+@app.route('/progress/<job_id>')
+def get_progress(job_id):
+    if 'username' in session:
+        context = job_runner.context(job_id)
+        if context is None:
+            return jsonify({"message": "Unknown job."}), 404
+        return jsonify(context.progress)
+    else:
+        return redirect('/login')
+
+def progress_events(job_id, context):
+    """
+    Yields the Server-Sent Events of the progress stream of a job.
+
+    A 'state' event is sent when the job changes state, and a 'progress' event with the progress bars that changed,
+    in whole percents so a bar moves at most once per percent, whenever there are any. The stream ends with a 'done'
+    or 'failed' event holding the status of the job.
+    """
+    sent_progress = {}
+    sent_state = None
+    last_sent = time.time()
+    while True:
+        job = job_runner.status(job_id)
+        if job is None:
+            yield f'event: failed\ndata: {json.dumps({"state": "failed", "error": "Unknown job."})}\n\n'
+            return
+
+        changes = {}
+        for key, value in dict(context.progress).items():
+            value = min(round(value), PROGRESS_BAR_MAX)
+            if sent_progress.get(key) != value:
+                changes[key] = sent_progress[key] = value
+        if changes:
+            yield f'event: progress\ndata: {json.dumps(changes)}\n\n'
+            last_sent = time.time()
+
+        if job['state'] in ('done', 'failed'):
+            yield f'event: {job["state"]}\ndata: {json.dumps(job)}\n\n'
+            return
+        if job['state'] != sent_state:
+            sent_state = job['state']
+            yield f'event: state\ndata: {json.dumps({"state": sent_state})}\n\n'
+            last_sent = time.time()
+        elif time.time() - last_sent >= PROGRESS_STREAM_KEEPALIVE:
+            yield ': keepalive\n\n'
+            last_sent = time.time()
+
+        time.sleep(PROGRESS_STREAM_INTERVAL)
+
+@app.route('/progress/<job_id>/stream')
+def stream_progress(job_id):
     if 'username' in session:
-        return jsonify(progress)
+        context = job_runner.context(job_id)
+        if context is None:
+            return jsonify({"message": "Unknown job."}), 404
+        return Response(stream_with_context(progress_events(job_id, context)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
     else:
         return redirect('/login')
 
 @app.route('/startsetup', methods=['POST'])
 def startSetup():
     if 'username' in session:
-        run_setup()
-        return jsonify({"message": "Reports setup initiated successfully."}), 200
+        options = request.get_json(silent=True) or {}
+        reports = options.get('reports', list(REPORTS))
+        if not isinstance(reports, list) or not reports or any(key not in REPORTS for key in reports):
+            return jsonify({"message": f"The reports must be a list of: {', '.join(REPORTS)}."}), 400
+        job_id = job_runner.submit('setup', RunContext(reports), run_setup, force_refresh=bool(options.get('force_refresh')))
+        return jsonify({"message": "Reports setup initiated successfully.", "job_id": job_id}), 202
     else:
         return redirect('/login')
 
 @app.route('/startreports', methods=['POST'])
 def startReports():
     if 'username' in session:
-        run_reports()
-        return jsonify({"message": "Reports initiated successfully."}), 200
+        # The reports are generated from the run of the given setup job
+        options = request.get_json(silent=True) or {}
+        setup_job = job_runner.status(options.get('job_id'))
+        context = job_runner.context(options.get('job_id'))
+        if setup_job is None or setup_job['kind'] != 'setup' or setup_job['state'] != 'done' or context.snapshot is None:
+            return jsonify({"message": "The reports need the id of a recently finished setup job whose reports were not generated yet."}), 400
+        formats = options.get('formats', DEFAULT_REPORT_FORMATS)
+        if not isinstance(formats, list) or not formats or any(report_format not in REPORT_FORMATS for report_format in formats):
+            return jsonify({"message": f"The formats must be a list of: {', '.join(REPORT_FORMATS)}."}), 400
+        job_id = job_runner.submit('reports', context, run_reports, formats=list(dict.fromkeys(formats)))
+        return jsonify({"message": "Reports initiated successfully.", "job_id": job_id}), 202
+    else:
+        return redirect('/login')
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    if 'username' in session:
+        job = job_runner.status(job_id)
+        if job is None:
+            return jsonify({"message": "Unknown job."}), 404
+        return jsonify(job)
     else:
         return redirect('/login')
 
@@ -1571,6 +2020,10 @@ def download_file(filename):
     if 'username' in session:
         now = datetime.now()
         formatted_date = now.strftime("%Y-%m-%d")
-        return send_from_directory('./reports/', escape(filename), as_attachment=True, download_name=f'library-report-{formatted_date}.xlsx')
+        name, extension = filename.split('.', 1) if '.' in filename else (filename, '')
+        # A report file's name holds the fingerprint of the data it was generated from, which is also its ETag,
+        # so a client sending it back in If-None-Match gets a 304 Not Modified response instead of the file again
+        return send_from_directory('./reports/', escape(filename), as_attachment=True, download_name=f'library-report-{formatted_date}.{extension}',
+                                   etag=name.removeprefix('library-report-'))
     else:
         return redirect('/login')
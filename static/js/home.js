@@ -1,31 +1,40 @@
 async function startReports(){
-    if (!confirm("WARNING: The library reporter will make the Bixal Library Website run slower than usual. Are you sure you want to run the reports?")) {
-        return
+    const reports = Array.from(document.querySelectorAll('input[name="report"]:checked')).map(input => input.value);
+    if (reports.length == 0) {
+        alert('Please select at least one report.');
+        return;
     }
+    document.getElementById('report-selection').style.display="none";
 
     const button = document.getElementById('run-button');
     button.style.display="none";
 
+    const force_refresh = document.getElementById('force-refresh').checked;
+    document.getElementById('force-refresh-label').style.display="none";
+
+    const report_format = document.getElementById('report-format').value;
+    document.getElementById('report-format-label').style.display="none";
+
     const progress_display =  document.getElementById('progress-display')
 
-    progress_display.innerHTML += '<h3>Creating Dictionaries</h3>';
+    progress_display.innerHTML += '<h3>Gathering Library Data</h3>';
 
-    progress_display.innerHTML += '<p>Processing User_ID to Name and User_ID to Email Dictionaries:</p> ';
+    progress_display.innerHTML += '<p>Gathering User Names and Emails:</p> ';
     progress_display.innerHTML += '<progress id="p0" value="0" max="100"></progress>';
 
-    progress_display.innerHTML += '<p>Processing Shelf_ID to Slug, Shelf_ID to Name, and Shelf_ID to Owner_ID Dictionaries:</p> ';
+    progress_display.innerHTML += '<p>Gathering Shelf Slugs, Names and Owners:</p> ';
     progress_display.innerHTML += '<progress id="p1" value="0" max="100"></progress>';
 
-    progress_display.innerHTML += '<p>Processing Book_ID to Shelf_ID Dictionary:</p> ';
+    progress_display.innerHTML += '<p>Gathering the Books on Each Shelf:</p> ';
     progress_display.innerHTML += '<progress id="p2" value="0" max="100"></progress>';
 
-    progress_display.innerHTML += '<p>Processing Book_ID to Slug, Book_ID to Name, and Book_ID to Owner_ID Dictionaries:</p> ';
+    progress_display.innerHTML += '<p>Gathering Book Slugs, Names and Owners:</p> ';
     progress_display.innerHTML += '<progress id="p3" value="0" max="100"></progress>';
 
-    progress_display.innerHTML += '<p>Processing Chapter_ID to Slug, Chapter_ID to Name, Chapter_ID to Owner_ID, and Chapter_ID to Book_ID Dictionaries:</p> ';
+    progress_display.innerHTML += '<p>Gathering Chapter Slugs, Names, Owners and Books:</p> ';
     progress_display.innerHTML += '<progress id="p4" value="0" max="100"></progress>';
 
-    progress_display.innerHTML += '<p>Processing Page_ID to Slug, Page_ID to Name, and Page_ID to Book_ID Dictionaries:</p> ';
+    progress_display.innerHTML += '<p>Gathering Page Slugs, Names and Books:</p> ';
     progress_display.innerHTML += '<progress id="p5" value="0" max="100"></progress>';
 
     const progress_bar_0 = document.getElementById('p0')
@@ -36,140 +45,183 @@ async function startReports(){
     const progress_bar_5 = document.getElementById('p5')
 
     // Starting the Setup
-    fetch('/startsetup', {
-        method: 'POST'
-    });
+    let setup_job;
+    try {
+        setup_job = await startJob('/startsetup', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({force_refresh: force_refresh, reports: reports})
+        });
+    } catch (error) {
+        progress_display.innerHTML += `<h3>Library Data Gathering Failed: ${error.message}</h3>`;
+        return;
+    }
 
-    while (progress_bar_5.value < 99.99) {
-        try {
-            const response = await fetch('/progress');
-            if (!response.ok) {
-                throw new Error('Network response was not ok');
-            }
-            const data = await response.json();
-            if ('p0' in data) {
-                progress_bar_0.value = data.p0;
-            }
-            if ('p1' in data) {
-                progress_bar_1.value = data.p1;
-            }
-            if ('p2' in data) {
-                progress_bar_2.value = data.p2;
-            }
-            if ('p3' in data) {
-                progress_bar_3.value = data.p3;
-            }
-            if ('p4' in data) {
-                progress_bar_4.value = data.p4;
-            }
-            if ('p5' in data) {
-                progress_bar_5.value = data.p5;
-            }
-            // Wait for 1 second before the next iteration
-            await new Promise(resolve => setTimeout(resolve, 1000));
-        } catch (error) {
-            console.error('There was a problem with the fetch operation:', error);
-        }
+    const setup_status = await waitForJob(setup_job, [progress_bar_0, progress_bar_1, progress_bar_2, progress_bar_3, progress_bar_4, progress_bar_5]);
+    if (setup_status.state != 'done') {
+        progress_display.innerHTML += `<h3>Library Data Gathering Failed: ${setup_status.error}</h3>`;
+        return;
     }
 
-    progress_display.innerHTML += '<h3>Dictionary Creation Complete!</h3>';
+    progress_display.innerHTML += '<h3>Library Data Gathered!</h3>';
 
 
     progress_display.innerHTML += '<h3>Creating Reports (ETA: 8 Minutes)...</h3>';
 
-    progress_display.innerHTML += '<p>Gathering Tags For All Pages:</p> ';
-    progress_display.innerHTML += '<progress id="p6" value="0" max="100"></progress>';
-
-    progress_display.innerHTML += '<p>Formatting All Pages:</p> ';
-    progress_display.innerHTML += '<progress id="p7" value="0" max="100"></progress>';
+    if (reports.includes('pages')) {
+        progress_display.innerHTML += '<p>Gathering Tags For All Pages:</p> ';
+        progress_display.innerHTML += '<progress id="p6" value="0" max="100"></progress>';
+        progress_display.innerHTML += '<p>Formatting All Pages:</p> ';
+        progress_display.innerHTML += '<progress id="p7" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Formatting All Attachments:</p> ';
-    progress_display.innerHTML += '<progress id="p8" value="0" max="100"></progress>';
+    if (reports.includes('attachments')) {
+        progress_display.innerHTML += '<p>Formatting All Attachments:</p> ';
+        progress_display.innerHTML += '<progress id="p8" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Formatting All Books:</p> ';
-    progress_display.innerHTML += '<progress id="p9" value="0" max="100"></progress>';
+    if (reports.includes('chapters')) {
+        progress_display.innerHTML += '<p>Formatting All Chapters:</p> ';
+        progress_display.innerHTML += '<progress id="p12" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Filtering All Books for Duplicates:</p> ';
-    progress_display.innerHTML += '<progress id="p10" value="0" max="100"></progress>';
+    if (reports.includes('books')) {
+        progress_display.innerHTML += '<p>Formatting All Books:</p> ';
+        progress_display.innerHTML += '<progress id="p9" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Filtering All Books For Any That Are Unshelved:</p> ';
-    progress_display.innerHTML += '<progress id="p11" value="0" max="100"></progress>';
+    if (reports.includes('shelves')) {
+        progress_display.innerHTML += '<p>Formatting All Shelves:</p> ';
+        progress_display.innerHTML += '<progress id="p14" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Formatting All Chapters:</p> ';
-    progress_display.innerHTML += '<progress id="p12" value="0" max="100"></progress>';
+    if (reports.includes('users')) {
+        progress_display.innerHTML += '<p>Formatting All Users:</p> ';
+        progress_display.innerHTML += '<progress id="p15" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Filtering All Pages for Duplicates:</p> ';
-    progress_display.innerHTML += '<progress id="p13" value="0" max="100"></progress>';
+    if (reports.includes('duplicate_books')) {
+        progress_display.innerHTML += '<p>Filtering All Books for Duplicates:</p> ';
+        progress_display.innerHTML += '<progress id="p10" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Formatting All Shelves:</p> ';
-    progress_display.innerHTML += '<progress id="p14" value="0" max="100"></progress>';
+    if (reports.includes('unshelved_books')) {
+        progress_display.innerHTML += '<p>Filtering All Books For Any That Are Unshelved:</p> ';
+        progress_display.innerHTML += '<progress id="p11" value="0" max="100"></progress>';
+    }
 
-    progress_display.innerHTML += '<p>Formatting All Users:</p> ';
-    progress_display.innerHTML += '<progress id="p15" value="0" max="100"></progress>';
+    if (reports.includes('duplicate_pages')) {
+        progress_display.innerHTML += '<p>Filtering All Pages for Duplicates:</p> ';
+        progress_display.innerHTML += '<progress id="p13" value="0" max="100"></progress>';
+    }
 
-    const progress_bar_6 = document.getElementById('p6')
-    const progress_bar_7 = document.getElementById('p7')
-    const progress_bar_8 = document.getElementById('p8')
-    const progress_bar_9 = document.getElementById('p9')
-    const progress_bar_10 = document.getElementById('p10')
-    const progress_bar_11 = document.getElementById('p11')
-    const progress_bar_12 = document.getElementById('p12')
-    const progress_bar_13 = document.getElementById('p13')
-    const progress_bar_14 = document.getElementById('p14')
-    const progress_bar_15 = document.getElementById('p15')
+    const report_progress_bars = ['p6', 'p7', 'p8', 'p12', 'p9', 'p14', 'p15', 'p10', 'p11', 'p13'].map(id => document.getElementById(id)).filter(progress_bar => progress_bar);
 
     // Starting the Reports
-    fetch('/startreports', {
-        method: 'POST'
+    let reports_job;
+    try {
+        reports_job = await startJob('/startreports', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({job_id: setup_job, formats: [report_format]})
+        });
+    } catch (error) {
+        progress_display.innerHTML += `<h3>Report Creation Failed: ${error.message}</h3>`;
+        return;
+    }
+
+    const reports_status = await waitForJob(reports_job, report_progress_bars);
+    if (reports_status.state != 'done') {
+        progress_display.innerHTML += `<h3>Report Creation Failed: ${reports_status.error}</h3>`;
+        return;
+    }
+
+    progress_display.innerHTML += '<h3>Report Creation Complete!</h3>';
+    for (const filename of reports_status.result) {
+        progress_display.innerHTML += `<a href="/download/${filename}" download><button>Download Report</button></a>`
+    }
+
+}
+
+// Starts a background job on the server and returns its id, throws an error with the server's message if the job was refused
+async function startJob(url, options){
+    const response = await fetch(url, options);
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.message || `The server answered with status ${response.status}`);
+    }
+    return data.job_id;
+}
+
+// Follows the progress of a job until it is done or failed, then returns the status of the job.
+// The progress is pushed by the server through an event stream, with polling as a fallback if the stream is not available.
+async function waitForJob(job_id, progress_bars){
+    if (window.EventSource) {
+        const job = await streamJob(job_id, progress_bars);
+        if (job) {
+            return job;
+        }
+    }
+    return pollJob(job_id, progress_bars);
+}
+
+// Sets the progress bars from the progress values of a job, filling them all once the job is done
+function updateProgressBars(progress_bars, data, job){
+    for (const progress_bar of progress_bars) {
+        if (job && job.state == 'done') {
+            progress_bar.value = progress_bar.max;
+        } else if (progress_bar.id in data) {
+            progress_bar.value = data[progress_bar.id];
+        }
+    }
+}
+
+// Updates the progress bars from the event stream of the job, returns the status of the job or null if the stream broke off
+function streamJob(job_id, progress_bars){
+    return new Promise(resolve => {
+        const source = new EventSource(`/progress/${job_id}/stream`);
+        source.addEventListener('progress', event => {
+            updateProgressBars(progress_bars, JSON.parse(event.data), null);
+        });
+        for (const state of ['done', 'failed']) {
+            source.addEventListener(state, event => {
+                source.close();
+                const job = JSON.parse(event.data);
+                updateProgressBars(progress_bars, {}, job);
+                resolve(job);
+            });
+        }
+        source.onerror = () => {
+            source.close();
+            resolve(null);
+        };
     });
+}
 
-    while (progress_bar_15.value < 99.99) {
+// Updates the progress bars every second until the job is done or failed, then returns the status of the job.
+// A job unknown to the server, e.g. forgotten after too many other jobs, is reported as failed.
+async function pollJob(job_id, progress_bars){
+    while (true) {
         try {
-            const response = await fetch('/progress');
-            if (!response.ok) {
+            const progress_response = await fetch(`/progress/${job_id}`);
+            const job_response = await fetch(`/jobs/${job_id}`);
+            if (progress_response.status == 404 || job_response.status == 404) {
+                return {state: 'failed', error: 'Unknown job.'};
+            }
+            if (!progress_response.ok || !job_response.ok) {
                 throw new Error('Network response was not ok');
             }
-            const data = await response.json();
+            const data = await progress_response.json();
+            const job = await job_response.json();
 
-            if ('p6' in data) {
-                progress_bar_6.value = data.p6;
-            }
-            if ('p7' in data) {
-                progress_bar_7.value = data.p7;
-            }
-            if ('p8' in data) {
-                progress_bar_8.value = data.p8;
-            }
-            if ('p9' in data) {
-                progress_bar_9.value = data.p9;
-            }
-            if ('p10' in data) {
-                progress_bar_10.value = data.p10;
-            }
-            if ('p11' in data) {
-                progress_bar_11.value = data.p11;
-            }
-            if ('p12' in data) {
-                progress_bar_12.value = data.p12;
+            updateProgressBars(progress_bars, data, job);
+            if (job.state == 'done' || job.state == 'failed') {
+                return job;
             }
-            if ('p13' in data) {
-                progress_bar_13.value = data.p13;
-            }
-            if ('p14' in data) {
-                progress_bar_14.value = data.p14;
-            }
-            if ('p15' in data) {
-                progress_bar_15.value = data.p15;
-            }
-            // Wait for 1 second before the next iteration
-            await new Promise(resolve => setTimeout(resolve, 1000));
         } catch (error) {
             console.error('There was a problem with the fetch operation:', error);
         }
+        // Wait for 1 second before the next iteration
+        await new Promise(resolve => setTimeout(resolve, 1000));
     }
-
-    progress_display.innerHTML += '<h3>Report Creation Complete!</h3>';
-    const date = new Date();
-    progress_display.innerHTML += `<a href="/download/library-report.xlsx" download><button>Download Report</button></a>`
-
-}
\ No newline at end of file
+}